@@ -0,0 +1,138 @@
+"""Bounded record queue between a stream's fetchers and the Singer writer."""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Iterable, Iterator, Optional
+
+
+class BoundedRecordQueue:
+    """Thread-safe record queue that blocks producers once a record or byte limit is reached.
+
+    A single record larger than `max_bytes` is still let through when the queue is empty. Records are sized by
+    JSON-encoding one in every `size_sample_every`, the others count as the average sampled size.
+    """
+
+    size_sample_every = 100
+
+    def __init__(self, max_records: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self._records: deque = deque()
+        self._bytes = 0
+        self._condition = threading.Condition()
+        self._finished = False
+        self._cancelled = False
+        self._error: Optional[BaseException] = None
+        self.max_depth = 0
+        self.max_depth_bytes = 0
+        self.producer_wait_seconds = 0.0
+        self._records_put = 0
+        self._sampled_records = 0
+        self._sampled_bytes = 0
+
+    def _is_full(self, size: int) -> bool:
+        if not self._records:
+            return False
+        if self.max_records and len(self._records) >= self.max_records:
+            return True
+        return self.max_bytes is not None and self._bytes + size > self.max_bytes
+
+    def _estimate_size(self, record: dict) -> int:
+        """Return the JSON size of a sampled record, or the average sampled size, called from the producer."""
+        self._records_put += 1
+        if self._sampled_records and self._records_put % self.size_sample_every:
+            return self._sampled_bytes // self._sampled_records
+        size = len(json.dumps(record, default=str))
+        self._sampled_records += 1
+        self._sampled_bytes += size
+        return size
+
+    def put(self, record: dict) -> bool:
+        """Add a record, waiting for space; return False if the consumer has gone away."""
+        size = self._estimate_size(record) if self.max_bytes else 0
+        with self._condition:
+            if self._is_full(size):
+                start = time.monotonic()
+                while self._is_full(size) and not self._cancelled:
+                    self._condition.wait()
+                self.producer_wait_seconds += time.monotonic() - start
+            if self._cancelled:
+                return False
+            self._records.append((record, size))
+            self._bytes += size
+            self.max_depth = max(self.max_depth, len(self._records))
+            self.max_depth_bytes = max(self.max_depth_bytes, self._bytes)
+            self._condition.notify_all()
+        return True
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """Mark the producer as done, passing on the exception it failed with, if any."""
+        with self._condition:
+            self._finished = True
+            self._error = error
+            self._condition.notify_all()
+
+    def cancel(self) -> None:
+        """Stop accepting records, releasing any blocked producer."""
+        with self._condition:
+            self._cancelled = True
+            self._records.clear()
+            self._condition.notify_all()
+
+    def __iter__(self) -> Iterator[dict]:
+        while True:
+            with self._condition:
+                while not self._records and not self._finished:
+                    self._condition.wait()
+                if not self._records:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                record, size = self._records.popleft()
+                self._bytes -= size
+                self._condition.notify_all()
+            yield record
+
+
+def buffer_records(
+    records: Iterable[dict],
+    max_records: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    logger: Optional[logging.Logger] = None,
+    name: str = "",
+) -> Iterator[dict]:
+    """Fetch records on a producer thread into a bounded queue, yielding them to the caller as it writes."""
+    queue = BoundedRecordQueue(max_records, max_bytes)
+
+    def produce():
+        try:
+            for record in records:
+                if not queue.put(record):
+                    return
+        except BaseException as ex:
+            queue.finish(ex)
+            return
+        queue.finish()
+
+    producer = threading.Thread(target=produce, name=f"{name}-fetch", daemon=True)
+    producer.start()
+    try:
+        yield from queue
+    finally:
+        queue.cancel()
+        (logger or logging.getLogger(__name__)).info(
+            f"Record queue for '{name}': max depth {queue.max_depth} records"
+            f" ({queue.max_depth_bytes} bytes), fetchers blocked for {queue.producer_wait_seconds:.1f}s"
+        )
+
+
+def buffer_stream_records(stream, records: Iterable[dict]) -> Iterable[dict]:
+    """Buffer a stream's records through a bounded queue if `record_queue_max_*` is configured."""
+    max_records = stream.config.get("record_queue_max_records")
+    max_bytes = stream.config.get("record_queue_max_bytes")
+    if not max_records and not max_bytes:
+        return records
+    return buffer_records(records, max_records, max_bytes, logger=stream.logger, name=stream.name)
@@ -0,0 +1,157 @@
+"""HTTP record/replay cache shared by the TSC server session and the metadata streams."""
+
+import base64
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Mapping, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from tap_tableau.session import TunedHTTPAdapter, get_adapter_options
+
+CACHE_MODES = ("readwrite", "offline")
+# Sign-in, sign-out and site switching carry live session tokens, so they always go to the server
+UNCACHED_PATH_PART = "/auth/"
+
+
+class CacheMissError(RuntimeError):
+    """Raised in offline mode when a request has no cached response."""
+
+
+class HTTPCache:
+    """Disk store of HTTP responses keyed by a hash of site, method, URL and body.
+
+    The site is part of the key as the metadata API URL is the same for every site on a server.
+    """
+
+    def __init__(self, cache_dir: str, ttl: Optional[int] = None, mode: str = "readwrite", site: str = ""):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown http_cache_mode '{mode}', expected one of {CACHE_MODES}")
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.mode = mode
+        self.site = site or ""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def get_key(method: str, url: str, body, site: str = "") -> str:
+        digest = hashlib.sha256()
+        digest.update(site.encode())
+        digest.update(b"\n")
+        digest.update(method.upper().encode())
+        digest.update(b"\n")
+        digest.update(url.encode())
+        digest.update(b"\n")
+        if body:
+            digest.update(body if isinstance(body, bytes) else str(body).encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def is_stale(self, entry: dict) -> bool:
+        if self.ttl is None:
+            return False
+        return time.time() - entry["stored_at"] > self.ttl
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached entry for a key, honouring the TTL unless offline."""
+        path = self._path(key)
+        try:
+            with path.open() as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.mode != "offline" and self.is_stale(entry):
+            return None
+        return entry
+
+    def set(self, key: str, response: requests.Response) -> None:
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        entry = {
+            "stored_at": time.time(),
+            "url": response.url,
+            "status_code": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+            "encoding": response.encoding,
+            "content": base64.b64encode(response.content).decode(),
+        }
+        # Write then rename so a concurrent reader never sees a partial entry
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with tmp_path.open("w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def evict_expired(self) -> int:
+        """Delete entries older than the TTL and return how many were removed."""
+        if self.ttl is None:
+            return 0
+        removed = 0
+        cutoff = time.time() - self.ttl
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+
+class CachingHTTPAdapter(TunedHTTPAdapter):
+    """Transport adapter serving responses from an `HTTPCache` when possible."""
+
+    def __init__(self, cache: HTTPCache, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+
+    def send(self, request: requests.PreparedRequest, *args, **kwargs) -> requests.Response:
+        method, url = request.method or "GET", request.url or ""
+        if UNCACHED_PATH_PART in urlparse(url).path:
+            return super().send(request, *args, **kwargs)
+        key = self.cache.get_key(method, url, request.body, self.cache.site)
+        entry = self.cache.get(key)
+        if entry is not None:
+            return self._build_response_from_entry(request, entry)
+        if self.cache.mode == "offline":
+            raise CacheMissError(f"No cached response for {method} {url}")
+        response = super().send(request, *args, **kwargs)
+        if response.ok:
+            self.cache.set(key, response)
+        return response
+
+    def _build_response_from_entry(self, request: requests.PreparedRequest, entry: dict) -> requests.Response:
+        response = requests.Response()
+        response.status_code = entry["status_code"]
+        response.reason = entry["reason"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = entry["encoding"]
+        response.url = entry["url"]
+        response._content = base64.b64decode(entry["content"])
+        response.request = request
+        response.connection = self
+        return response
+
+
+def install_http_cache(session: requests.Session, config: Mapping[str, Any]) -> None:
+    """Mount a caching adapter, pooled like `configure_session`'s, on a session if `http_cache_dir` is configured."""
+    if not config.get("http_cache_dir"):
+        return
+    cache = HTTPCache(
+        config["http_cache_dir"],
+        ttl=config.get("http_cache_ttl"),
+        mode=config.get("http_cache_mode", "readwrite"),
+        site=config.get("site_url_id") or "",
+    )
+    if cache.mode != "offline":
+        cache.evict_expired()
+    caching_adapter = CachingHTTPAdapter(cache, **get_adapter_options(config))
+    session.mount("https://", caching_adapter)
+    session.mount("http://", caching_adapter)
@@ -1,23 +1,459 @@
 """GraphQL client handling, including TableauStream base class and TableauMetadataStream base class."""
 
-import requests
+import abc
+import multiprocessing
+import os
+import time
+from datetime import datetime, timezone
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from urllib.parse import urlparse
 
+import requests
+
 from singer_sdk.streams import GraphQLStream
 from singer_sdk.authenticators import APIKeyAuthenticator
 from singer_sdk.streams import RESTStream
 
+from tap_tableau.backpressure import buffer_stream_records
+from tap_tableau.cache import install_http_cache
+from tap_tableau.concurrency import AdaptiveConcurrency
+from tap_tableau.deletions import decode_id_set
+from tap_tableau.deletions import encode_id_set
+from tap_tableau.graphql import compile_query
+from tap_tableau.graphql import get_page
+from tap_tableau.graphql import stream_selection
+from tap_tableau.project_tree import ProjectTree
+from tap_tableau.session import configure_session
+from tap_tableau.sharding import fetch_metadata_shard
+from tap_tableau.sharding import split_into_shards
+from tap_tableau.utils import format_datetime
+from tap_tableau.utils import get_permission_rule_id
+from tap_tableau.utils import limit_records
+from tap_tableau.writer import FastRecordWriterMixin
+
+if TYPE_CHECKING:
+    import tableauserverclient as TSC
+
+
+# GraphQL variable type and filter field for each variable a query can be narrowed by
+QUERY_FILTERS = {
+    "luids": ("[String]", "luidWithin"),
+    "ids": ("[ID]", "idWithin"),
+}
+
+
+class cached_schema:
+    """Build a stream's JSON schema on first access and keep it on the class.
+
+    Streams that are never instantiated, e.g. the REST streams during a metadata run, never pay for it.
+    """
+
+    def __init__(self, func):
+        self.func = func
+
+    def __set_name__(self, owner, name):
+        self.name = name
 
-class TableauStream(RESTStream):
-    """Tableau stream class."""
+    def __get__(self, instance, owner) -> dict:
+        schema = self.func(owner)
+        setattr(owner, self.name, schema)
+        return schema
+
+
+class TableauStream(FastRecordWriterMixin, RESTStream):
+    """Tableau stream class.
+
+    Streams implement `request_records` over the TSC server client, so the SDK's `get_records` still applies `post_process`.
+    """
 
     url_base = None
+    # Signed-in TSC server client, set by the tap before any stream syncs
+    server_client: "TSC.Server"
+    shared_ids: Optional[Dict[str, set]] = None
+    # Distinct permission rule sets seen this run, by rule id, for the permission_rules stream
+    permission_rules: Optional[Dict[str, list]] = None
+    permission_fields: tuple = ()
+    concurrency: Optional[AdaptiveConcurrency] = None
+    project_tree: Optional[ProjectTree] = None
+    # Properties filled from the project tree, which is only built if one of them is selected
+    project_path_fields: tuple = ()
+    # Attribute of the TSC server client the stream pages through
+    endpoint_name: Optional[str] = None
+    # TSC's default page size, used to project page requests
+    page_size = 100
+    estimate_sample_size = 10
+
+    @property
+    def endpoint(self):
+        return getattr(self.server_client, self.endpoint_name)
+
+    def get_records(self, context: Optional[dict]) -> Iterable[dict]:
+        """Return a generator of row-type dictionary objects, bounded and cut short as configured."""
+        records = buffer_stream_records(self, super().get_records(context))
+        try:
+            yield from limit_records(records, self.config.get("max_records_per_stream"))
+        finally:
+            # Rows collected for items whose records were cut short are never synced
+            self.discard_child_rows()
+
+    def discard_child_rows(self) -> None:
+        for child_stream in self.child_streams:
+            if isinstance(child_stream, TableauChildStream):
+                child_stream.pending.clear()
+
+    def record_ids(self, items: Iterable, ids: Set[str]) -> Iterator:
+        """Pass listed items through, adding their ids to `ids` when deletions are detected."""
+        detect_deletions = self.config.get("detect_deletions")
+        for item in items:
+            if detect_deletions:
+                ids.add(item.id)
+            yield item
+
+    def get_tombstones(self, listed_ids: Set[str]) -> Iterator[dict]:
+        """Yield a tombstone for every id synced on a previous run that the sync's listing no longer had.
 
+        `listed_ids` are collected by `record_ids` while the stream pages through every item, and kept in state.
+        """
+        if not self.config.get("detect_deletions"):
+            return
+        known_ids = decode_id_set(self.stream_state.get("known_ids", ""))
+        deleted_at = format_datetime(datetime.now(timezone.utc))
+        for deleted_id in sorted(known_ids - listed_ids):
+            yield {"id": deleted_id, "_sdc_deleted_at": deleted_at}
+        self.stream_state["known_ids"] = encode_id_set(listed_ids)
 
-class TableauMetadataStream(GraphQLStream):
+    def get_selected_child(self, name: str) -> Optional["TableauChildStream"]:
+        """Return the named child stream if it is selected, so the parent leaves that data to it."""
+        for child_stream in self.child_streams:
+            if child_stream.name == name and child_stream.selected:
+                return child_stream
+        return None
+
+    @property
+    def emits_project_path(self) -> bool:
+        return self.project_tree is not None and any(
+            self.mask.get(("properties", field), True) for field in self.project_path_fields
+        )
+
+    def get_project_path(self, project_id: Optional[str]) -> Tuple[Optional[str], List[str]]:
+        """Return the full path and ancestor ids of a project from the tap's project tree."""
+        if self.project_tree is None or not self.emits_project_path:
+            return None, []
+        return self.project_tree.get(project_id)
+
+    def estimate(self) -> Optional[dict]:
+        """Project the stream's sync cost from its first page and a sample of per-item populate calls."""
+        if self.endpoint_name is None:
+            return None
+        import tableauserverclient as TSC
+
+        if self.project_tree is not None and self.emits_project_path:
+            # Built once per run, so its listing is left out of the per-item sample
+            self.project_tree.load()
+        calls = []
+
+        def hook(response, *args, **kwargs):
+            calls.append(response)
+
+        self.server_client._session.hooks["response"].append(hook)
+        try:
+            start = time.monotonic()
+            items, pagination = self.endpoint.get(TSC.RequestOptions(pagesize=self.estimate_sample_size))
+            page_seconds = time.monotonic() - start
+            calls.clear()
+            start = time.monotonic()
+            if hasattr(self, "get_row"):
+                # Selected child streams fetch inside get_row, so their calls are part of the sample
+                for item in items:
+                    self.get_row(item)
+            populate_seconds = time.monotonic() - start
+        finally:
+            self.server_client._session.hooks["response"].remove(hook)
+            self.discard_child_rows()
+        total = pagination.total_available
+        pages = -(-total // self.page_size)
+        sampled = max(len(items), 1)
+        return {
+            "stream": self.name,
+            "records": total,
+            "calls": pages + round(total * len(calls) / sampled),
+            "seconds": pages * page_seconds + total * populate_seconds / sampled,
+        }
+
+    def pager(self, endpoint, request_options=None):
+        """Return a TSC pager over an endpoint, importing TSC only once a REST stream syncs."""
+        import tableauserverclient as TSC
+
+        return TSC.Pager(endpoint, request_options)
+
+    def map_concurrently(self, func: Callable, items: Iterable) -> Iterator:
+        """Apply `func` to items on the tap's adaptive pool if there is one, preserving order."""
+        if self.concurrency is None:
+            return map(func, items)
+        return self.concurrency.map(func, items)
+
+    def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
+        """Normalize permissions if enabled and record ids shared with the metadata streams."""
+        if self.config.get("normalize_permissions") and self.permission_rules is not None:
+            for field in self.permission_fields:
+                if field not in row:
+                    continue
+                permissions = row.pop(field)
+                rule_id = get_permission_rule_id(permissions)
+                self.permission_rules.setdefault(rule_id, permissions)
+                row[f"{field}_rule_id"] = rule_id
+        if self.shared_ids is not None:
+            self.shared_ids.setdefault(self.name, set()).add(row["id"])
+        return row
+
+
+class TableauChildStream(TableauStream):
+    """Stream of the connections or permissions of a parent stream's items, opted into with `split_child_streams`.
+
+    The parent's `get_row` calls `collect` for each item on the populate pool, and the child stream emits the
+    collected rows when the SDK syncs it for that item's record.
+    """
+
+    # Context key holding the parent item's id, also added to every row
+    parent_key: str = ""
+    # Per-parent state would grow with every item
+    state_partitioning_keys: List[str] = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pending: Dict[str, List[dict]] = {}
+        self._schema_written = False
+
+    @property
+    def selected(self) -> bool:
+        """Return False unless `split_child_streams` is set, so parents keep embedding this data by default."""
+        return bool(self.config.get("split_child_streams")) and super().selected
+
+    def _write_schema_message(self) -> None:
+        """Write the schema once per run rather than every time the stream is synced for a parent item."""
+        if self._schema_written:
+            return
+        self._schema_written = True
+        super()._write_schema_message()
+
+    def _write_state_message(self) -> None:
+        """Leave state messages to the parent, as the state is not partitioned by parent and the parent writes it too."""
+
+    @abc.abstractmethod
+    def fetch_rows(self, item) -> List[dict]:
+        """Populate a parent item and return the stream's rows for it."""
+
+    def collect(self, item) -> None:
+        """Fetch an item's rows until the stream is synced for it, called from the parent's `get_row`."""
+        self.pending[item.id] = self.fetch_rows(item)
+
+    def get_records(self, context: Optional[dict]) -> Iterable[dict]:
+        """Return the rows for the parent item in `context`, without the parent stream's buffering."""
+        return RESTStream.get_records(self, context)
+
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
+        """Return a generator of row-type dictionary objects.
+        """
+        if context is None:
+            return
+        parent_id = context[self.parent_key]
+        for row in self.pending.pop(parent_id, []):
+            row[self.parent_key] = parent_id
+            yield row
+
+    def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
+        return row
+
+    def estimate(self) -> Optional[dict]:
+        """Child costs are part of the parent's populate sample."""
+        return None
+
+
+class TableauMetadataStream(FastRecordWriterMixin, GraphQLStream):
     """TableauMetadata stream class."""
 
-    api_token = None
+    api_token: Optional[str] = None
+    _http_cache_installed = False
+    shared_ids: Optional[Dict[str, set]] = None
+    # Name of the REST stream whose ids can narrow this stream's query, by `luid`
+    luid_source: Optional[str] = None
+    # Field of the response `data` holding the stream's rows
+    root_field: str = ""
+    # Schema properties built in parse_row, mapped to the selection they are built from
+    derived_fields: Dict[str, str] = {}
+    # Whether the stream can be fetched as id shards when `metadata_shards` is set
+    shardable = False
+    shard_ids: Optional[List[str]] = None
+    next_cursor: Optional[str] = None
+    estimate_sample_size = 10
+    # Rows per page, unless `metadata_page_size` is set, and per page of an id-only listing
+    page_size = 100
+    id_page_size = 1000
+
+    @property
+    def shared_luids(self) -> Optional[List[str]]:
+        """Return the luids synced by `luid_source` in this run, if it was synced."""
+        if self.shared_ids is None or self.luid_source not in self.shared_ids:
+            return None
+        return sorted(self.shared_ids[self.luid_source])
+
+    @property
+    def query(self) -> str:
+        """Return the query for the stream's schema, narrowed by any filters in play."""
+        return compile_query(self.name, self.root_field, stream_selection(type(self)), self.query_variables, self.query_filter)
+
+    @property
+    def query_arguments(self) -> Dict[str, List[str]]:
+        """Return the GraphQL variables narrowing this request, by name."""
+        arguments = {}
+        luids = self.shared_luids
+        if luids is not None:
+            arguments["luids"] = luids
+        if self.shard_ids is not None:
+            arguments["ids"] = self.shard_ids
+        return arguments
+
+    @property
+    def query_variables(self) -> str:
+        """Return the declarations of the filter variables, e.g. `$luids: [String]`."""
+        return ", ".join(f"${name}: {QUERY_FILTERS[name][0]}" for name in self.query_arguments)
+
+    @property
+    def query_filter(self) -> str:
+        """Return the fields of the filter argument, e.g. `luidWithin: $luids`."""
+        return ", ".join(f"{QUERY_FILTERS[name][1]}: ${name}" for name in self.query_arguments)
+
+    def get_page_size(self) -> int:
+        return self.config.get("metadata_page_size") or self.page_size
+
+    def prepare_request_payload(self, context: Optional[dict], next_page_token: Optional[Any]) -> Optional[dict]:
+        """Prepare the GraphQL payload, passing the page cursor and filters as variables rather than URL params."""
+        payload = super().prepare_request_payload(context, next_page_token)
+        payload["variables"] = {"first": self.get_page_size(), "after": next_page_token, **self.query_arguments}
+        return payload
+
+    def parse_response(self, response: requests.Response) -> Iterable[dict]:
+        rows, self.next_cursor = get_page(response.json()["data"], self.root_field)
+        for row in rows:
+            yield self.parse_row(row)
+
+    def get_next_page_token(self, response: requests.Response, previous_token: Optional[Any]) -> Optional[Any]:
+        """Return the cursor read by `parse_response`, so each page is only decoded once."""
+        return self.next_cursor
+
+    def parse_row(self, row: dict) -> dict:
+        """Return a row of the response, reshaped to the stream's schema."""
+        return row
+
+    def get_records(self, context: Optional[dict]) -> Iterable[dict]:
+        """Return a generator of row-type dictionary objects, bounded and cut short as configured."""
+        records = buffer_stream_records(self, self.get_unlimited_records(context))
+        return limit_records(records, self.config.get("max_records_per_stream"))
+
+    def get_unlimited_records(self, context: Optional[dict]) -> Iterable[dict]:
+        """Return a generator of row-type dictionary objects, sharded across processes if configured."""
+        if not self.sharded:
+            yield from super().get_records(context)
+            return
+        for row in self.request_sharded_records(self.config["metadata_shards"]):
+            transformed_row = self.post_process(self.parse_row(row), context)
+            if transformed_row is not None:
+                yield transformed_row
+
+    @property
+    def sharded(self) -> bool:
+        return self.shardable and (self.config.get("metadata_shards") or 0) > 1
+
+    def estimate(self) -> Optional[dict]:
+        """Project the stream's sync cost from an id-only listing and a sample queried in full."""
+        start = time.monotonic()
+        ids = self.request_ids()
+        ids_seconds = time.monotonic() - start
+        sample = ids[:self.estimate_sample_size]
+        self.shard_ids = sample
+        try:
+            start = time.monotonic()
+            list(self.request_nodes(self.query, self.estimate_sample_size))
+            sample_seconds = time.monotonic() - start
+        finally:
+            self.shard_ids = None
+        seconds = len(ids) * sample_seconds / max(len(sample), 1)
+        page_size = self.get_page_size()
+        calls = max(1, -(-len(ids) // page_size))
+        if self.sharded:
+            shards = self.config["metadata_shards"]
+            processes = self.config.get("metadata_processes") or os.cpu_count() or 1
+            seconds = ids_seconds + seconds / min(shards, processes)
+            # Each shard pages through its own ids, after the id listing's pages
+            calls = max(1, -(-len(ids) // self.id_page_size)) + sum(
+                -(-len(shard) // page_size) for shard in split_into_shards(ids, shards)
+            )
+        return {
+            "stream": self.name,
+            "records": len(ids),
+            "calls": calls,
+            "seconds": seconds,
+        }
+
+    def request_nodes(self, query: str, page_size: int) -> Iterator[dict]:
+        """Yield the rows of every page of a query, narrowed by the stream's filters."""
+        variables: Dict[str, Any] = {"first": page_size, "after": None, **self.query_arguments}
+        while True:
+            payload = {"query": query, "variables": variables}
+            response = self.requests_session.post(self.url_base, json=payload, headers=self.request_headers)
+            response.raise_for_status()
+            rows, cursor = get_page(response.json()["data"], self.root_field)
+            yield from rows
+            if cursor is None:
+                return
+            variables["after"] = cursor
+
+    def request_ids(self) -> List[str]:
+        """Return the ids of every object in the stream, using a cheap id-only query."""
+        query = compile_query(f"{self.name}_ids", self.root_field, "id", self.query_variables, self.query_filter)
+        return [row["id"] for row in self.request_nodes(query, self.id_page_size)]
+
+    def request_sharded_records(self, shards: int) -> Iterator[dict]:
+        """Fetch and decode the stream as id shards in a process pool, yielding rows in id order."""
+        ids = self.request_ids()
+        payloads = []
+        for shard in split_into_shards(ids, shards):
+            self.shard_ids = shard
+            payloads.append({"query": self.query, "variables": {"first": self.get_page_size(), **self.query_arguments}})
+        self.shard_ids = None
+        self.logger.info(f"Fetching {len(ids)} '{self.name}' records in {len(payloads)} shards.")
+        http_config = {key: value for key, value in self.config.items() if key.startswith("http_") or key == "site_url_id"}
+        processes = self.config.get("metadata_processes") or os.cpu_count() or 1
+        headers = self.request_headers
+        # Spawn rather than fork, as the parent has live pool, queue and session threads holding locks
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as executor:
+            # Only keep as many shards in flight as there are workers, so decoded rows don't pile up
+            pending: deque = deque()
+            for payload in payloads:
+                if len(pending) >= processes:
+                    yield from pending.popleft().result()
+                pending.append(executor.submit(
+                    fetch_metadata_shard, self.url_base, headers, payload, self.root_field, http_config
+                ))
+            while pending:
+                yield from pending.popleft().result()
+
+    @property
+    def request_headers(self) -> dict:
+        """Return the http headers including authentication, for requests made outside the SDK."""
+        return {**self.http_headers, **self.authenticator.auth_headers}
+
+    @property
+    def requests_session(self) -> requests.Session:
+        """Return the requests session, pooled and with the HTTP cache mounted if configured."""
+        session = super().requests_session
+        if not self._http_cache_installed:
+            configure_session(session, self.config)
+            install_http_cache(session, self.config)
+            self._http_cache_installed = True
+        return session
 
     @property
     def authenticator(self) -> APIKeyAuthenticator:
@@ -47,7 +483,7 @@ class TableauMetadataStream(GraphQLStream):
                 }
             }
         }
-        response = requests.post(url, json=payload, headers=self.http_headers)
+        response = self.requests_session.post(url, json=payload, headers=self.http_headers)
         try:
             response.raise_for_status()
             self.logger.info("Login was successful.")
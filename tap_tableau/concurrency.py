@@ -0,0 +1,125 @@
+"""Adaptive concurrency for the per-item populate calls of the REST streams."""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional
+
+import requests
+
+# Statuses that mean the server is overloaded, so the item is retried after backing off
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class AdaptiveConcurrency:
+    """Run work on a thread pool whose size is tuned by an AIMD policy.
+
+    After every `window_size` requests the p95 latency and error rate of the window are checked:
+    if either is over target the limit is halved, otherwise it grows by one, between 1 and `max_workers`.
+    Requests are timed by a response hook once `watch` is given the session, otherwise each call counts as one.
+    Items failing on a throttling or server error are retried with exponential backoff, up to `max_retries` times.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        target_p95: float = 2.0,
+        max_error_rate: float = 0.05,
+        window_size: int = 10,
+        max_retries: int = 5,
+        retry_backoff: float = 1.0,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.target_p95 = target_p95
+        self.max_error_rate = max_error_rate
+        self.window_size = window_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.logger = logger or logging.getLogger(__name__)
+        self.limit = 1
+        self._latencies: List[float] = []
+        self._errors = 0
+        self._lock = threading.Lock()
+        self._watching = False
+        # Last response seen by each worker thread, to tell whether a failed call can be retried
+        self._local = threading.local()
+
+    def record(self, latency: float, error: bool = False) -> None:
+        """Record one request and adjust the limit once a window is complete."""
+        with self._lock:
+            self._latencies.append(latency)
+            self._errors += int(error)
+            if len(self._latencies) < self.window_size:
+                return
+            latencies = sorted(self._latencies)
+            p95 = latencies[int(0.95 * (len(latencies) - 1))]
+            error_rate = self._errors / len(latencies)
+            self._latencies = []
+            self._errors = 0
+
+            previous = self.limit
+            if p95 > self.target_p95 or error_rate > self.max_error_rate:
+                self.limit = max(1, self.limit // 2)
+            else:
+                self.limit = min(self.max_workers, self.limit + 1)
+            if self.limit != previous:
+                self.logger.info(
+                    f"Concurrency {previous} -> {self.limit} (p95 latency {p95:.2f}s, error rate {error_rate:.0%})"
+                )
+
+    def watch(self, session: requests.Session) -> None:
+        """Time every request of a session, counting throttling and server errors."""
+        session.hooks["response"].append(self._on_response)
+        self._watching = True
+
+    def _on_response(self, response: requests.Response, *args, **kwargs) -> None:
+        self._local.response = response
+        self.record(response.elapsed.total_seconds(), error=response.status_code in RETRYABLE_STATUS_CODES)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Return how long to wait before retrying after `error`, or None if it is not retryable."""
+        response = getattr(self._local, "response", None)
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            retry_after = None
+        elif response is not None and response.status_code in RETRYABLE_STATUS_CODES:
+            retry_after = response.headers.get("Retry-After")
+        else:
+            return None
+        delay = self.retry_backoff * 2 ** attempt
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        return delay
+
+    def _run(self, func: Callable, item):
+        for attempt in range(self.max_retries + 1):
+            self._local.response = None
+            start = time.monotonic()
+            try:
+                result = func(item)
+            except Exception as ex:
+                # Failed connections never reach the response hook
+                if not self._watching or isinstance(ex, (requests.ConnectionError, requests.Timeout)):
+                    self.record(time.monotonic() - start, error=True)
+                delay = self._retry_delay(ex, attempt)
+                if delay is None or attempt == self.max_retries:
+                    raise
+                self.logger.info(f"Retrying in {delay:.1f}s after {ex}")
+                time.sleep(delay)
+                continue
+            if not self._watching:
+                self.record(time.monotonic() - start)
+            return result
+
+    def map(self, func: Callable, items: Iterable) -> Iterator:
+        """Apply `func` to every item concurrently, yielding results in input order."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending: deque = deque()
+            for item in items:
+                while len(pending) >= self.limit:
+                    yield pending.popleft().result()
+                pending.append(executor.submit(self._run, func, item))
+            while pending:
+                yield pending.popleft().result()
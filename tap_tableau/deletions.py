@@ -0,0 +1,32 @@
+"""Compact storage of synced id sets in state, for detecting deleted objects."""
+
+import base64
+import uuid
+import zlib
+from typing import Iterable, Set
+
+UUID_PREFIX = "uuid:"
+PLAIN_PREFIX = "plain:"
+
+
+def encode_id_set(ids: Iterable[str]) -> str:
+    """Encode ids as a compact string, packing Tableau's UUID luids into 16 sorted bytes each."""
+    ids = sorted(set(ids))
+    try:
+        packed = b"".join(uuid.UUID(id_).bytes for id_ in ids)
+        prefix = UUID_PREFIX
+    except ValueError:
+        packed = "\n".join(ids).encode()
+        prefix = PLAIN_PREFIX
+    return prefix + base64.b64encode(zlib.compress(packed)).decode()
+
+
+def decode_id_set(encoded: str) -> Set[str]:
+    """Decode a string produced by `encode_id_set`."""
+    if not encoded:
+        return set()
+    prefix, _, data = encoded.partition(":")
+    packed = zlib.decompress(base64.b64decode(data))
+    if f"{prefix}:" == UUID_PREFIX:
+        return {str(uuid.UUID(bytes=packed[index:index + 16])) for index in range(0, len(packed), 16)}
+    return set(packed.decode().split("\n")) if packed else set()
@@ -0,0 +1,74 @@
+"""Metadata API query builder, generating selections from stream schemas."""
+
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+# Shared selections for schema fields that are flattened from a nested object in parse_row
+SITE_LUID = "site { luid }"
+OWNER_ID = "owner { id }"
+OWNER_LUID = "owner { luid }"
+CERTIFIER_LUID = "certifier { luid }"
+
+# Every query pages through the root field's connection with a cursor
+PAGE_VARIABLES = "$first: Int, $after: String"
+PAGE_INFO = "pageInfo { hasNextPage endCursor }"
+
+# Selections generated so far, by stream class
+_selections: Dict[type, str] = {}
+
+
+def schema_selection(schema: dict, derived_fields: Mapping[str, str]) -> str:
+    """Return the GraphQL selection fetching every property of a JSON schema.
+
+    Objects and arrays of objects become nested selections, `derived_fields` maps properties that are not
+    queried directly to the selection they are built from.
+    """
+    parts = []
+    for name, prop in schema["properties"].items():
+        if name in derived_fields:
+            part = derived_fields[name]
+        else:
+            item = prop.get("items", prop)
+            if "properties" in item:
+                part = f"{name} {{ {schema_selection(item, {})} }}"
+            else:
+                part = name
+        if part not in parts:
+            parts.append(part)
+    return " ".join(parts)
+
+
+def stream_selection(stream_class: Any) -> str:
+    """Return a metadata stream's selection, generated once per stream class."""
+    selection = _selections.get(stream_class)
+    if selection is None:
+        selection = _selections[stream_class] = schema_selection(stream_class.schema, stream_class.derived_fields)
+    return selection
+
+
+def connection_field(root_field: str) -> str:
+    """Return the paginated variant of a root field, e.g. `workbooksConnection`."""
+    return f"{root_field}Connection"
+
+
+@lru_cache(maxsize=None)
+def compile_query(operation: str, root_field: str, selection: str, variables: str = "", filter_fields: str = "") -> str:
+    """Return the compact query text for a page of `root_field`, cached per distinct selection and filter.
+
+    `variables` declares any filter variables, e.g. `$ids: [ID]`, and `filter_fields` uses them, e.g. `idWithin: $ids`.
+    """
+    declarations = ", ".join(part for part in (PAGE_VARIABLES, variables) if part)
+    arguments = "first: $first, after: $after"
+    if filter_fields:
+        arguments += f", filter: {{{filter_fields}}}"
+    return (
+        f"query {operation}({declarations}) {{ {connection_field(root_field)}({arguments}) "
+        f"{{ nodes {{ {selection} }} {PAGE_INFO} }} }}"
+    )
+
+
+def get_page(data: dict, root_field: str) -> Tuple[List[dict], Optional[str]]:
+    """Return the rows of a response page and the cursor of the next page, None on the last page."""
+    connection = data[connection_field(root_field)]
+    page_info = connection["pageInfo"]
+    return connection["nodes"], page_info["endCursor"] if page_info["hasNextPage"] else None
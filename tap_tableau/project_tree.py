@@ -0,0 +1,54 @@
+"""In-memory index of the project hierarchy, built once per run."""
+
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class ProjectTree:
+    """Full paths and ancestor ids of every project, loaded on first lookup.
+
+    `load_projects` returns objects with `id`, `name` and `parent_id`, e.g. a TSC pager over projects.
+    """
+
+    separator = "/"
+
+    def __init__(self, load_projects: Callable[[], Iterable]):
+        self._load_projects = load_projects
+        self._index: Optional[Dict[str, Tuple[str, List[str]]]] = None
+        self._lock = threading.Lock()
+
+    def _build(self) -> Dict[str, Tuple[str, List[str]]]:
+        projects = {project.id: (project.name, project.parent_id) for project in self._load_projects()}
+        index: Dict[str, Tuple[str, List[str]]] = {}
+        for project_id in projects:
+            # Walk up to the first indexed ancestor or the root, then index the chain top down
+            chain = []
+            current = project_id
+            while current in projects and current not in index and current not in chain:
+                chain.append(current)
+                current = projects[current][1]
+            for node in reversed(chain):
+                name, parent_id = projects[node]
+                if parent_id in index:
+                    parent_path, parent_ancestor_ids = index[parent_id]
+                    index[node] = (f"{parent_path}{self.separator}{name}", parent_ancestor_ids + [parent_id])
+                else:
+                    index[node] = (name, [])
+        return index
+
+    def load(self) -> Dict[str, Tuple[str, List[str]]]:
+        """Build the index if it has not been built yet and return it."""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._build()
+        return self._index
+
+    def get(self, project_id: Optional[str]) -> Tuple[Optional[str], List[str]]:
+        """Return the full path of a project and the ids of its ancestors, root first."""
+        if project_id is None:
+            return None, []
+        entry = self.load().get(project_id)
+        if entry is None:
+            return None, []
+        return entry
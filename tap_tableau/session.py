@@ -0,0 +1,43 @@
+"""Connection pool, keep-alive, compression and timeout settings for the tap's HTTP sessions."""
+
+from typing import Any, Mapping
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+# Seconds to wait for a connection, the read timeout is configurable as metadata queries can be slow
+CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 300
+
+
+class TunedHTTPAdapter(HTTPAdapter):
+    """Transport adapter applying a default timeout to requests made without one."""
+
+    def __init__(self, *args, timeout=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timeout = timeout
+
+    def send(self, request: requests.PreparedRequest, *args, **kwargs) -> requests.Response:
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, *args, **kwargs)
+
+
+def get_adapter_options(config: Mapping[str, Any]) -> dict:
+    """Return pool and timeout options for an adapter, sized so concurrent requests never wait on or discard connections."""
+    max_concurrency = config.get("max_concurrency", 8)
+    return {
+        # Per-item fetches run up to max_concurrency requests, beside the pager and project tree listings
+        "pool_maxsize": max_concurrency + 2,
+        "timeout": (CONNECT_TIMEOUT, config.get("http_timeout", DEFAULT_READ_TIMEOUT)),
+    }
+
+
+def configure_session(session: requests.Session, config: Mapping[str, Any]) -> None:
+    """Mount a pooled adapter with timeouts on a session and set its keep-alive and compression headers."""
+    adapter = TunedHTTPAdapter(**get_adapter_options(config))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING if config.get("http_compression", True) else "identity"
@@ -0,0 +1,45 @@
+"""Helpers for fetching a metadata stream as disjoint shards in a process pool."""
+
+from typing import List
+
+import requests
+
+from tap_tableau.cache import install_http_cache
+from tap_tableau.graphql import get_page
+from tap_tableau.session import configure_session
+
+
+def split_into_shards(ids: List[str], shards: int) -> List[List[str]]:
+    """Split ids into at most `shards` contiguous, similarly sized and non-empty lists."""
+    size, remainder = divmod(len(ids), shards)
+    result = []
+    start = 0
+    for index in range(shards):
+        end = start + size + (1 if index < remainder else 0)
+        if end > start:
+            result.append(ids[start:end])
+        start = end
+    return result
+
+
+def fetch_metadata_shard(url: str, headers: dict, payload: dict, root_field: str, http_config: dict) -> List[dict]:
+    """Run one shard's GraphQL query over all its pages and return its rows in the order of the shard's ids.
+
+    Runs in a worker process, so fetching and JSON decoding happen off the main process.
+    """
+    session = requests.Session()
+    configure_session(session, http_config)
+    install_http_cache(session, http_config)
+    rows: List[dict] = []
+    variables = dict(payload["variables"])
+    while True:
+        response = session.post(url, json={**payload, "variables": variables}, headers=headers)
+        response.raise_for_status()
+        nodes, cursor = get_page(response.json()["data"], root_field)
+        rows.extend(nodes)
+        if cursor is None:
+            break
+        variables["after"] = cursor
+    position = {id_: index for index, id_ in enumerate(payload["variables"]["ids"])}
+    rows.sort(key=lambda row: position.get(row["id"], len(position)))
+    return rows
@@ -1,238 +1,317 @@
 """Stream type classes for tap-tableau-metadata."""
 
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Optional, Union, List, Iterable
+from typing import Any, Dict, Optional, Union, List, Iterable, Set
 
-import requests
-import tableauserverclient as TSC
 from singer_sdk import typing as th  # JSON Schema typing helpers
-from tableauserverclient.server.endpoint.exceptions import ServerResponseError
 
+from tap_tableau.client import TableauChildStream
 from tap_tableau.client import TableauMetadataStream
+from tap_tableau.client import cached_schema
+from tap_tableau.graphql import CERTIFIER_LUID
+from tap_tableau.graphql import OWNER_ID
+from tap_tableau.graphql import OWNER_LUID
+from tap_tableau.graphql import SITE_LUID
 from tap_tableau.client import TableauStream
 from tap_tableau.utils import format_datetime
+from tap_tableau.utils import format_filter_datetime
+from tap_tableau.utils import get_connection_details
 from tap_tableau.utils import get_permission_details
+from tap_tableau.utils import get_tags
 from tap_tableau.utils import get_user_details
+from tap_tableau.utils import get_workbook_permissions
+from tap_tableau.utils import intern_string
+from tap_tableau.utils import is_older_than
 
 
 class DatasourcesStream(TableauStream):
     name = "datasources"
     primary_keys = ["id"]
     replication_key = None
-    schema = th.PropertiesList(
-        th.Property("id", th.StringType),
-        th.Property("ask_data_enablement", th.BooleanType),
-        th.Property("certification_note", th.StringType),
-        th.Property("certified", th.BooleanType),
-        th.Property("connections", th.ArrayType(
-            th.ObjectType(
-                th.Property("connection_type", th.StringType),
-                th.Property("datasource_id", th.StringType),
-                th.Property("datasource_name", th.StringType),
-                th.Property("embed_password", th.BooleanType),
-                th.Property("id", th.StringType),
-                th.Property("server_address", th.StringType),
-                th.Property("server_port", th.NumberType),
-                th.Property("username", th.StringType),
-           )
-        )),
-        th.Property("content_url", th.StringType),
-        th.Property("created_at", th.DateTimeType),
-        th.Property("datasource_type", th.StringType),
-        th.Property("description", th.StringType),
-        th.Property("encrypt_extracts", th.BooleanType),
-        th.Property("has_extracts", th.BooleanType),
-        th.Property("name", th.StringType),
-        th.Property("owner_id", th.StringType),
-        th.Property("permissions", th.ArrayType(
-            th.ObjectType(
-                th.Property("capabilities", th.ObjectType(
-                    th.Property("Connect", th.StringType),
-                    th.Property("Read", th.StringType),
-                    th.Property("Write", th.StringType),
-                )),
-                th.Property("grantee_id", th.StringType),
-                th.Property("grantee_tag_name", th.StringType),
-            )
-        )),
-        th.Property("project_id", th.StringType),
-        th.Property("project_name", th.StringType),
-        th.Property("tags", th.ArrayType(th.StringType)),
-        th.Property("updated_at", th.DateTimeType),
-        th.Property("use_remote_query_agent", th.BooleanType),
-    ).to_dict()
-
-    def get_records(self, context: Optional[dict]) -> Iterable[dict]:
-        """Return a generator of row-type dictionary objects.
+    endpoint_name = "datasources"
+    project_path_fields = ("project_path", "project_ancestor_ids")
+    permission_fields = ("permissions",)
+
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
+            th.Property("id", th.StringType),
+            th.Property("ask_data_enablement", th.BooleanType),
+            th.Property("certification_note", th.StringType),
+            th.Property("certified", th.BooleanType),
+            th.Property("connections", th.ArrayType(
+                th.ObjectType(
+                    th.Property("connection_type", th.StringType),
+                    th.Property("datasource_id", th.StringType),
+                    th.Property("datasource_name", th.StringType),
+                    th.Property("embed_password", th.BooleanType),
+                    th.Property("id", th.StringType),
+                    th.Property("server_address", th.StringType),
+                    th.Property("server_port", th.NumberType),
+                    th.Property("username", th.StringType),
+               )
+            )),
+            th.Property("content_url", th.StringType),
+            th.Property("created_at", th.DateTimeType),
+            th.Property("datasource_type", th.StringType),
+            th.Property("description", th.StringType),
+            th.Property("encrypt_extracts", th.BooleanType),
+            th.Property("has_extracts", th.BooleanType),
+            th.Property("name", th.StringType),
+            th.Property("owner_id", th.StringType),
+            th.Property("permissions", th.ArrayType(
+                th.ObjectType(
+                    th.Property("capabilities", th.ObjectType(
+                        th.Property("Connect", th.StringType),
+                        th.Property("Read", th.StringType),
+                        th.Property("Write", th.StringType),
+                    )),
+                    th.Property("grantee_id", th.StringType),
+                    th.Property("grantee_tag_name", th.StringType),
+                )
+            )),
+            th.Property("permissions_rule_id", th.StringType),
+            th.Property("project_id", th.StringType),
+            th.Property("project_name", th.StringType),
+            th.Property("project_path", th.StringType),
+            th.Property("project_ancestor_ids", th.ArrayType(th.StringType)),
+            th.Property("tags", th.ArrayType(th.StringType)),
+            th.Property("updated_at", th.DateTimeType),
+            th.Property("use_remote_query_agent", th.BooleanType),
+            th.Property("_sdc_deleted_at", th.DateTimeType),
+        ).to_dict()
+
+    def get_row(self, datasource) -> dict:
+        """Populate a datasource and return its row, called on the concurrency pool.
         """
-        for datasource in TSC.Pager(self.server_client.datasources):
+        project_path, project_ancestor_ids = self.get_project_path(datasource.project_id)
+        row = {
+            'ask_data_enablement': datasource.ask_data_enablement,
+            'certification_note': datasource.certification_note,
+            'certified': datasource.certified,
+            'content_url': datasource.content_url,
+            'created_at': format_datetime(datasource.created_at),
+            'datasource_type': datasource.datasource_type,
+            'description': datasource.description,
+            'encrypt_extracts': datasource.encrypt_extracts,
+            'has_extracts': datasource.has_extracts,
+            'id': datasource.id,
+            'name': datasource.name,
+            'owner_id': datasource.owner_id,
+            'project_id': intern_string(datasource.project_id),
+            'project_name': intern_string(datasource.project_name),
+            'project_path': project_path,
+            'project_ancestor_ids': project_ancestor_ids,
+            'tags': get_tags(datasource.tags),
+            'updated_at': format_datetime(datasource.updated_at),
+            'use_remote_query_agent': datasource.use_remote_query_agent,
+        }
+        connections_stream = self.get_selected_child("datasource_connections")
+        if connections_stream is None:
             self.server_client.datasources.populate_connections(datasource)
+            row['connections'] = [get_connection_details(connection) for connection in datasource.connections]
+        else:
+            connections_stream.collect(datasource)
+        permissions_stream = self.get_selected_child("datasource_permissions")
+        if permissions_stream is None:
             self.server_client.datasources.populate_permissions(datasource)
-            row = {
-                'ask_data_enablement': datasource.ask_data_enablement,
-                'certification_note': datasource.certification_note,
-                'certified': datasource.certified,
-                'connections': [{
-                    'connection_type': connection.connection_type,
-                    'datasource_id': connection.datasource_id,
-                    'datasource_name': connection.datasource_name,
-                    'embed_password': connection.embed_password,
-                    'id': connection.id,
-                    'server_address': connection.server_address,
-                    'server_port': connection.server_port,
-                    'username': connection.username
-                } for connection in datasource.connections],
-                'content_url': datasource.content_url,
-                'created_at': format_datetime(datasource.created_at),
-                'datasource_type': datasource.datasource_type,
-                'description': datasource.description,
-                'encrypt_extracts': datasource.encrypt_extracts,
-                'has_extracts': datasource.has_extracts,
-                'id': datasource.id,
-                'name': datasource.name,
-                'owner_id': datasource.owner_id,
-                'permissions': [get_permission_details(permission) for permission in datasource.permissions],
-                'project_id': datasource.project_id,
-                'project_name': datasource.project_name,
-                'tags': list(datasource.tags),
-                'updated_at': format_datetime(datasource.updated_at),
-                'use_remote_query_agent': datasource.use_remote_query_agent,
-            }
-            yield row
+            row['permissions'] = [get_permission_details(permission) for permission in datasource.permissions]
+        else:
+            permissions_stream.collect(datasource)
+        return row
+
+    def get_child_context(self, record: dict, context: Optional[dict]) -> dict:
+        return {"datasource_id": record["id"]}
+
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
+        """Return a generator of row-type dictionary objects.
+        """
+        listed_ids: Set[str] = set()
+        yield from self.map_concurrently(self.get_row, self.record_ids(self.pager(self.endpoint), listed_ids))
+        yield from self.get_tombstones(listed_ids)
 
 
 class GroupsStream(TableauStream):
     name = "groups"
     primary_keys = ["id"]
     replication_key = None
-    schema = th.PropertiesList(
-        th.Property("id", th.StringType),
-        th.Property("domain_name", th.StringType),
-        th.Property("license_mode", th.StringType),
-        th.Property("minimum_site_role", th.StringType),
-        th.Property("name", th.StringType),
-        th.Property("tag_name", th.StringType),
-        th.Property("users", th.ArrayType(
-            th.ObjectType(
-                th.Property("id", th.StringType),
-                th.Property("auth_setting", th.StringType),
-                th.Property("email", th.StringType),
-                th.Property("name", th.StringType),
-                th.Property("full_name", th.StringType),
-                th.Property("role", th.StringType),
-            )
-        )),
-    ).to_dict()
-
-    def get_records(self, context: Optional[dict]) -> Iterable[dict]:
+    endpoint_name = "groups"
+
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
+            th.Property("id", th.StringType),
+            th.Property("domain_name", th.StringType),
+            th.Property("license_mode", th.StringType),
+            th.Property("minimum_site_role", th.StringType),
+            th.Property("name", th.StringType),
+            th.Property("tag_name", th.StringType),
+            th.Property("users", th.ArrayType(
+                th.ObjectType(
+                    th.Property("id", th.StringType),
+                    th.Property("auth_setting", th.StringType),
+                    th.Property("email", th.StringType),
+                    th.Property("name", th.StringType),
+                    th.Property("full_name", th.StringType),
+                    th.Property("role", th.StringType),
+                )
+            )),
+        ).to_dict()
+
+    def get_row(self, group) -> dict:
+        """Populate a group and return its row, called on the concurrency pool.
+        """
+        self.server_client.groups.populate_users(group)
+        row = {
+            'id': group.id,
+            'domain_name': group.domain_name,
+            'license_mode': group.license_mode,
+            'minimum_site_role': group.minimum_site_role,
+            'name': group.name,
+            'tag_name': group.tag_name,
+            'users': [get_user_details(user) for user in group.users]
+        }
+        return row
+
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
         """Return a generator of row-type dictionary objects.
         """
-        for group in TSC.Pager(self.server_client.groups):
-            self.server_client.groups.populate_users(group)
-            row = {
-                'id': group.id,
-                'domain_name': group.domain_name,
-                'license_mode': group.license_mode,
-                'minimum_site_role': group.minimum_site_role,
-                'name': group.name,
-                'tag_name': group.tag_name,
-                'users': [get_user_details(user) for user in group.users]
-            }
-            yield row
+        yield from self.map_concurrently(self.get_row, self.pager(self.endpoint))
 
 
 class ProjectsStream(TableauStream):
     name = "projects"
     primary_keys = ["id"]
     replication_key = None
-    schema = th.PropertiesList(
-        th.Property("id", th.StringType),
-        th.Property("name", th.StringType),
-        th.Property("owner_id", th.StringType),
-        th.Property("parent_id", th.StringType),
-        th.Property("description", th.StringType),
-        th.Property("is_default", th.BooleanType),
-        th.Property("content_permissions", th.StringType),
-        th.Property("default_datasource_permissions", th.ArrayType(
-            th.ObjectType(
-                th.Property("capabilities", th.ObjectType(
-                    th.Property("Connect", th.StringType),
-                    th.Property("Read", th.StringType),
-                    th.Property("Write", th.StringType),
-                )),
-                th.Property("grantee_id", th.StringType),
-                th.Property("grantee_tag_name", th.StringType),
-            )
-        )),
-        th.Property("default_flow_permissions", th.ArrayType(
-            th.ObjectType(
-                th.Property("capabilities", th.ObjectType(
-                    th.Property("Connect", th.StringType),
-                    th.Property("Read", th.StringType),
-                    th.Property("Write", th.StringType),
-                )),
-                th.Property("grantee_id", th.StringType),
-                th.Property("grantee_tag_name", th.StringType),
-            )
-        )),
-        th.Property("default_workbook_permissions", th.ArrayType(
-            th.ObjectType(
-                th.Property("capabilities", th.ObjectType(
-                    th.Property("Connect", th.StringType),
-                    th.Property("Read", th.StringType),
-                    th.Property("Write", th.StringType),
-                )),
-                th.Property("grantee_id", th.StringType),
-                th.Property("grantee_tag_name", th.StringType),
-            )
-        )),
-    ).to_dict()
-
-    def get_records(self, context: Optional[dict]) -> Iterable[dict]:
+    endpoint_name = "projects"
+    project_path_fields = ("path", "ancestor_ids")
+    permission_fields = (
+        "permissions",
+        "default_datasource_permissions",
+        "default_flow_permissions",
+        "default_workbook_permissions",
+    )
+
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
+            th.Property("id", th.StringType),
+            th.Property("name", th.StringType),
+            th.Property("owner_id", th.StringType),
+            th.Property("parent_id", th.StringType),
+            th.Property("path", th.StringType),
+            th.Property("ancestor_ids", th.ArrayType(th.StringType)),
+            th.Property("description", th.StringType),
+            th.Property("is_default", th.BooleanType),
+            th.Property("content_permissions", th.StringType),
+            th.Property("permissions", th.ArrayType(
+                th.ObjectType(
+                    th.Property("capabilities", th.ObjectType(
+                        th.Property("Connect", th.StringType),
+                        th.Property("Read", th.StringType),
+                        th.Property("Write", th.StringType),
+                    )),
+                    th.Property("grantee_id", th.StringType),
+                    th.Property("grantee_tag_name", th.StringType),
+                )
+            )),
+            th.Property("permissions_rule_id", th.StringType),
+            th.Property("default_datasource_permissions", th.ArrayType(
+                th.ObjectType(
+                    th.Property("capabilities", th.ObjectType(
+                        th.Property("Connect", th.StringType),
+                        th.Property("Read", th.StringType),
+                        th.Property("Write", th.StringType),
+                    )),
+                    th.Property("grantee_id", th.StringType),
+                    th.Property("grantee_tag_name", th.StringType),
+                )
+            )),
+            th.Property("default_datasource_permissions_rule_id", th.StringType),
+            th.Property("default_flow_permissions", th.ArrayType(
+                th.ObjectType(
+                    th.Property("capabilities", th.ObjectType(
+                        th.Property("Connect", th.StringType),
+                        th.Property("Read", th.StringType),
+                        th.Property("Write", th.StringType),
+                    )),
+                    th.Property("grantee_id", th.StringType),
+                    th.Property("grantee_tag_name", th.StringType),
+                )
+            )),
+            th.Property("default_flow_permissions_rule_id", th.StringType),
+            th.Property("default_workbook_permissions", th.ArrayType(
+                th.ObjectType(
+                    th.Property("capabilities", th.ObjectType(
+                        th.Property("Connect", th.StringType),
+                        th.Property("Read", th.StringType),
+                        th.Property("Write", th.StringType),
+                    )),
+                    th.Property("grantee_id", th.StringType),
+                    th.Property("grantee_tag_name", th.StringType),
+                )
+            )),
+            th.Property("default_workbook_permissions_rule_id", th.StringType),
+        ).to_dict()
+
+    def get_row(self, project) -> dict:
+        """Populate a project and return its row, called on the concurrency pool.
+        """
+        self.server_client.projects.populate_permissions(project)
+        self.server_client.projects.populate_datasource_default_permissions(project)
+        self.server_client.projects.populate_flow_default_permissions(project)
+        self.server_client.projects.populate_workbook_default_permissions(project)
+        path, ancestor_ids = self.get_project_path(project.id)
+        row = {
+            'content_permissions': project.content_permissions,
+            'default_datasource_permissions': [get_permission_details(permission) for permission in project.default_datasource_permissions],
+            'default_flow_permissions': [get_permission_details(permission) for permission in project.default_flow_permissions],
+            'default_workbook_permissions': [get_permission_details(permission) for permission in project.default_workbook_permissions],
+            'description': project.description,
+            'id': project.id,
+            'is_default': project.is_default(),
+            'name': project.name,
+            'owner_id': project.owner_id,
+            'parent_id': project.parent_id,
+            'path': path,
+            'ancestor_ids': ancestor_ids,
+            'permissions': [get_permission_details(permission) for permission in project.permissions],
+        }
+        return row
+
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
         """Return a generator of row-type dictionary objects.
         """
-        for project in TSC.Pager(self.server_client.projects):
-            self.server_client.projects.populate_permissions(project)
-            self.server_client.projects.populate_datasource_default_permissions(project)
-            self.server_client.projects.populate_flow_default_permissions(project)
-            self.server_client.projects.populate_workbook_default_permissions(project)
-            row = {
-                'content_permissions': project.content_permissions,
-                'default_datasource_permissions': [get_permission_details(permission) for permission in project.default_datasource_permissions],
-                'default_flow_permissions': [get_permission_details(permission) for permission in project.default_flow_permissions],
-                'default_workbook_permissions': [get_permission_details(permission) for permission in project.default_workbook_permissions],
-                'description': project.description,
-                'id': project.id,
-                'is_default': project.is_default(),
-                'name': project.name,
-                'owner_id': project.owner_id,
-                'parent_id': project.parent_id
-            }
-            yield row
+        yield from self.map_concurrently(self.get_row, self.pager(self.endpoint))
 
 
 class SchedulesStream(TableauStream):
     name = "schedules"
     primary_keys = ["id"]
     replication_key = None
-    schema = th.PropertiesList(
-        th.Property("id", th.StringType),
-        th.Property("name", th.StringType),
-        th.Property("interval_item", th.StringType),
-        th.Property("execution_order", th.StringType),
-        th.Property("priority", th.NumberType),
-        th.Property("schedule_type", th.StringType),
-        th.Property("state", th.StringType),
-        th.Property("created_at", th.DateTimeType),
-        th.Property("end_schedule_at", th.DateTimeType),
-        th.Property("next_run_at", th.DateTimeType),
-        th.Property("updated_at", th.DateTimeType),
-    ).to_dict()
-
-    def get_records(self, context: Optional[dict]) -> Iterable[dict]:
+    endpoint_name = "schedules"
+
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
+            th.Property("id", th.StringType),
+            th.Property("name", th.StringType),
+            th.Property("interval_item", th.StringType),
+            th.Property("execution_order", th.StringType),
+            th.Property("priority", th.NumberType),
+            th.Property("schedule_type", th.StringType),
+            th.Property("state", th.StringType),
+            th.Property("created_at", th.DateTimeType),
+            th.Property("end_schedule_at", th.DateTimeType),
+            th.Property("next_run_at", th.DateTimeType),
+            th.Property("updated_at", th.DateTimeType),
+        ).to_dict()
+
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
         """Return a generator of row-type dictionary objects.
         """
-        for schedule in TSC.Pager(self.server_client.schedules):
+        for schedule in self.pager(self.endpoint):
             row = {
                 'created_at': format_datetime(schedule.created_at),
                 'end_schedule_at': format_datetime(schedule.end_schedule_at),
@@ -253,23 +332,27 @@ class TasksStream(TableauStream):
     name = "tasks"
     primary_keys = ["id"]
     replication_key = None
-    schema = th.PropertiesList(
-        th.Property("id", th.StringType),
-        th.Property("task_type", th.StringType),
-        th.Property("schedule_id", th.StringType),
-        th.Property("priority", th.NumberType),
-        th.Property("last_run_at", th.DateTimeType),
-        th.Property("consecutive_failed_count", th.NumberType),
-        th.Property("target", th.ObjectType(
+    endpoint_name = "tasks"
+
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
             th.Property("id", th.StringType),
-            th.Property("type", th.StringType),
-        )),
-    ).to_dict()
+            th.Property("task_type", th.StringType),
+            th.Property("schedule_id", th.StringType),
+            th.Property("priority", th.NumberType),
+            th.Property("last_run_at", th.DateTimeType),
+            th.Property("consecutive_failed_count", th.NumberType),
+            th.Property("target", th.ObjectType(
+                th.Property("id", th.StringType),
+                th.Property("type", th.StringType),
+            )),
+        ).to_dict()
 
-    def get_records(self, context: Optional[dict]) -> Iterable[dict]:
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
         """Return a generator of row-type dictionary objects.
         """
-        for task in TSC.Pager(self.server_client.tasks):
+        for task in self.pager(self.endpoint):
             row = {
                 'consecutive_failed_count': task.consecutive_failed_count,
                 'id': task.id,
@@ -285,493 +368,551 @@ class TasksStream(TableauStream):
             yield row
 
 
+class UsersStream(TableauStream):
+    name = "users"
+    primary_keys = ["id"]
+    replication_key = "last_login"
+    endpoint_name = "users"
+    # Largest page size the REST API accepts
+    page_size = 1000
+
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
+            th.Property("id", th.StringType),
+            th.Property("auth_setting", th.StringType),
+            th.Property("email", th.StringType),
+            th.Property("external_auth_user_id", th.StringType),
+            th.Property("full_name", th.StringType),
+            th.Property("last_login", th.DateTimeType),
+            th.Property("name", th.StringType),
+            th.Property("role", th.StringType),
+        ).to_dict()
+
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
+        """Return a generator of row-type dictionary objects.
+
+        When a bookmark or `start_date` is available only users who logged in since are requested, so users edited
+        without logging in are only picked up by a full sync, forced every `users_full_sync_days` days if set.
+        """
+        import tableauserverclient as TSC
+
+        request_options = TSC.RequestOptions(pagesize=self.page_size)
+        start_value = self.get_starting_replication_key_value(context)
+        full_sync_days = self.config.get("users_full_sync_days")
+        full_sync = not start_value or (
+            full_sync_days is not None and is_older_than(self.stream_state.get("last_full_sync"), full_sync_days)
+        )
+        if not full_sync:
+            request_options.filter.add(TSC.Filter(
+                TSC.RequestOptions.Field.LastLogin,
+                TSC.RequestOptions.Operator.GreaterThanOrEqual,
+                format_filter_datetime(start_value),
+            ))
+        started_at = format_datetime(datetime.now(timezone.utc))
+        for user in self.pager(self.endpoint, request_options):
+            row = get_user_details(user)
+            row['external_auth_user_id'] = user.external_auth_user_id
+            row['last_login'] = format_datetime(user.last_login)
+            yield row
+        if full_sync:
+            self.stream_state["last_full_sync"] = started_at
+
+    def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
+        """Skip users who have never logged in, whose null last_login can't be bookmarked.
+
+        They are still synced by the `users_metadata` stream.
+        """
+        if row['last_login'] is None:
+            return None
+        return super().post_process(row, context)
+
+
 class WorkbooksStream(TableauStream):
     name = "workbooks"
     primary_keys = ["id"]
     replication_key = None
-    schema = th.PropertiesList(
-        th.Property("id", th.StringType),
-        th.Property("name", th.StringType),
-        th.Property("content_url", th.StringType),
-        th.Property("created_at", th.DateTimeType),
-        th.Property("data_acceleration_config", th.ObjectType(
-            th.Property("accelerate_now", th.BooleanType),
-            th.Property("acceleration_enabled", th.BooleanType),
-            th.Property("acceleration_status", th.StringType),
-            th.Property("last_updated_at", th.DateTimeType),
-        )),
-        th.Property("description", th.StringType),
-        th.Property("owner_id", th.StringType),
-        th.Property("permissions", th.ArrayType(
-            th.ObjectType(
-                th.Property("capabilities", th.ObjectType(
-                    th.Property("Connect", th.StringType),
-                    th.Property("Read", th.StringType),
-                    th.Property("Write", th.StringType),
-                )),
-                th.Property("grantee_id", th.StringType),
-                th.Property("grantee_tag_name", th.StringType),
-            )
-        )),
-        th.Property("project_id", th.StringType),
-        th.Property("project_name", th.StringType),
-        th.Property("show_tabs", th.BooleanType),
-        th.Property("size", th.NumberType),
-        th.Property("tags", th.ArrayType(th.StringType)),
-        th.Property("updated_at", th.DateTimeType),
-        th.Property("webpage_url", th.StringType),
-    ).to_dict()
-
-    def get_records(self, context: Optional[dict]) -> Iterable[dict]:
+    endpoint_name = "workbooks"
+    project_path_fields = ("project_path", "project_ancestor_ids")
+    permission_fields = ("permissions",)
+
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
+            th.Property("id", th.StringType),
+            th.Property("name", th.StringType),
+            th.Property("content_url", th.StringType),
+            th.Property("created_at", th.DateTimeType),
+            th.Property("data_acceleration_config", th.ObjectType(
+                th.Property("accelerate_now", th.BooleanType),
+                th.Property("acceleration_enabled", th.BooleanType),
+                th.Property("acceleration_status", th.StringType),
+                th.Property("last_updated_at", th.DateTimeType),
+            )),
+            th.Property("description", th.StringType),
+            th.Property("owner_id", th.StringType),
+            th.Property("permissions", th.ArrayType(
+                th.ObjectType(
+                    th.Property("capabilities", th.ObjectType(
+                        th.Property("Connect", th.StringType),
+                        th.Property("Read", th.StringType),
+                        th.Property("Write", th.StringType),
+                    )),
+                    th.Property("grantee_id", th.StringType),
+                    th.Property("grantee_tag_name", th.StringType),
+                )
+            )),
+            th.Property("permissions_rule_id", th.StringType),
+            th.Property("project_id", th.StringType),
+            th.Property("project_name", th.StringType),
+            th.Property("project_path", th.StringType),
+            th.Property("project_ancestor_ids", th.ArrayType(th.StringType)),
+            th.Property("show_tabs", th.BooleanType),
+            th.Property("size", th.NumberType),
+            th.Property("tags", th.ArrayType(th.StringType)),
+            th.Property("updated_at", th.DateTimeType),
+            th.Property("webpage_url", th.StringType),
+            th.Property("_sdc_deleted_at", th.DateTimeType),
+        ).to_dict()
+
+    def get_row(self, workbook) -> dict:
+        """Populate a workbook and return its row, called on the concurrency pool.
+        """
+        self.server_client.workbooks.populate_views(workbook)
+        project_path, project_ancestor_ids = self.get_project_path(workbook.project_id)
+        row = {
+            'content_url': workbook.content_url,
+            'created_at': format_datetime(workbook.created_at),
+            'data_acceleration_config': workbook.data_acceleration_config,
+            'description': workbook.description,
+            'id': workbook.id,
+            'name': workbook.name,
+            'owner_id': workbook.owner_id,
+            'project_id': intern_string(str(workbook.project_id)),
+            'project_name': intern_string(workbook.project_name),
+            'project_path': project_path,
+            'project_ancestor_ids': project_ancestor_ids,
+            'show_tabs': workbook.show_tabs,
+            'size': workbook.size,
+            'tags': get_tags(workbook.tags),
+            'updated_at': format_datetime(workbook.updated_at),
+            'webpage_url': workbook.webpage_url
+        }
+        connections_stream = self.get_selected_child("workbook_connections")
+        if connections_stream is not None:
+            connections_stream.collect(workbook)
+        permissions_stream = self.get_selected_child("workbook_permissions")
+        if permissions_stream is None:
+            row['permissions'] = get_workbook_permissions(self.server_client, workbook)
+        else:
+            permissions_stream.collect(workbook)
+        return row
+
+    def get_child_context(self, record: dict, context: Optional[dict]) -> dict:
+        return {"workbook_id": record["id"]}
+
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
         """Return a generator of row-type dictionary objects.
         """
-        for workbook in TSC.Pager(self.server_client.workbooks):
-            self.server_client.workbooks.populate_connections(workbook)
-            self.server_client.workbooks.populate_permissions(workbook)
-            self.server_client.workbooks.populate_views(workbook)
-            try:
-                permissions = [get_permission_details(permission) for permission in workbook.permissions]
-            except ServerResponseError:
-                permissions = []
-            row = {
-                'content_url': workbook.content_url,
-                'created_at': format_datetime(workbook.created_at),
-                'data_acceleration_config': workbook.data_acceleration_config,
-                'description': workbook.description,
-                'id': workbook.id,
-                'name': workbook.name,
-                'owner_id': workbook.owner_id,
+        listed_ids: Set[str] = set()
+        yield from self.map_concurrently(self.get_row, self.record_ids(self.pager(self.endpoint), listed_ids))
+        yield from self.get_tombstones(listed_ids)
+
+
+class DatasourceConnectionsStream(TableauChildStream):
+    name = "datasource_connections"
+    parent_stream_type = DatasourcesStream
+    primary_keys = ["id"]
+    replication_key = None
+    endpoint_name = "datasources"
+    parent_key = "datasource_id"
+
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
+            th.Property("connection_type", th.StringType),
+            th.Property("datasource_id", th.StringType),
+            th.Property("datasource_name", th.StringType),
+            th.Property("embed_password", th.BooleanType),
+            th.Property("id", th.StringType),
+            th.Property("server_address", th.StringType),
+            th.Property("server_port", th.NumberType),
+            th.Property("username", th.StringType),
+        ).to_dict()
+
+    def fetch_rows(self, datasource) -> List[dict]:
+        self.server_client.datasources.populate_connections(datasource)
+        return [get_connection_details(connection) for connection in datasource.connections]
+
+
+class DatasourcePermissionsStream(TableauChildStream):
+    name = "datasource_permissions"
+    parent_stream_type = DatasourcesStream
+    primary_keys = ["datasource_id", "grantee_id"]
+    replication_key = None
+    endpoint_name = "datasources"
+    parent_key = "datasource_id"
+
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
+            th.Property("datasource_id", th.StringType),
+            th.Property("capabilities", th.ObjectType(
+                th.Property("Connect", th.StringType),
+                th.Property("Read", th.StringType),
+                th.Property("Write", th.StringType),
+            )),
+            th.Property("grantee_id", th.StringType),
+            th.Property("grantee_tag_name", th.StringType),
+        ).to_dict()
+
+    def fetch_rows(self, datasource) -> List[dict]:
+        self.server_client.datasources.populate_permissions(datasource)
+        return [get_permission_details(permission) for permission in datasource.permissions]
+
+
+class WorkbookConnectionsStream(TableauChildStream):
+    name = "workbook_connections"
+    parent_stream_type = WorkbooksStream
+    primary_keys = ["workbook_id", "id"]
+    replication_key = None
+    endpoint_name = "workbooks"
+    parent_key = "workbook_id"
+
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
+            th.Property("workbook_id", th.StringType),
+            th.Property("connection_type", th.StringType),
+            th.Property("datasource_id", th.StringType),
+            th.Property("datasource_name", th.StringType),
+            th.Property("embed_password", th.BooleanType),
+            th.Property("id", th.StringType),
+            th.Property("server_address", th.StringType),
+            th.Property("server_port", th.NumberType),
+            th.Property("username", th.StringType),
+        ).to_dict()
+
+    def fetch_rows(self, workbook) -> List[dict]:
+        self.server_client.workbooks.populate_connections(workbook)
+        return [get_connection_details(connection) for connection in workbook.connections]
+
+
+class WorkbookPermissionsStream(TableauChildStream):
+    name = "workbook_permissions"
+    parent_stream_type = WorkbooksStream
+    primary_keys = ["workbook_id", "grantee_id"]
+    replication_key = None
+    endpoint_name = "workbooks"
+    parent_key = "workbook_id"
+
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
+            th.Property("workbook_id", th.StringType),
+            th.Property("capabilities", th.ObjectType(
+                th.Property("Connect", th.StringType),
+                th.Property("Read", th.StringType),
+                th.Property("Write", th.StringType),
+            )),
+            th.Property("grantee_id", th.StringType),
+            th.Property("grantee_tag_name", th.StringType),
+        ).to_dict()
+
+    def fetch_rows(self, workbook) -> List[dict]:
+        return get_workbook_permissions(self.server_client, workbook)
+
+
+class PermissionRulesStream(TableauStream):
+    """Distinct permission rule sets referenced by content streams when `normalize_permissions` is enabled.
+
+    Must sync after the content streams, whose records collect the rule sets.
+    """
+    name = "permission_rules"
+    primary_keys = ["id"]
+    replication_key = None
+
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
+            th.Property("id", th.StringType),
+            th.Property("permissions", th.ArrayType(
+                th.ObjectType(
+                    th.Property("capabilities", th.ObjectType(
+                        th.Property("Connect", th.StringType),
+                        th.Property("Read", th.StringType),
+                        th.Property("Write", th.StringType),
+                    )),
+                    th.Property("grantee_id", th.StringType),
+                    th.Property("grantee_tag_name", th.StringType),
+                )
+            )),
+        ).to_dict()
+
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
+        """Return a generator of row-type dictionary objects.
+        """
+        for rule_id, permissions in (self.permission_rules or {}).items():
+            yield {
+                'id': rule_id,
                 'permissions': permissions,
-                'project_id': str(workbook.project_id),
-                'project_name': workbook.project_name,
-                'show_tabs': workbook.show_tabs,
-                'size': workbook.size,
-                'tags': list(workbook.tags),
-                'updated_at': format_datetime(workbook.updated_at),
-                'webpage_url': workbook.webpage_url
             }
-            yield row
 
 
 class WorkbooksMetadataStream(TableauMetadataStream):
     name = "workbooks_metadata"
-    schema = th.PropertiesList(
-        th.Property("id", th.StringType),
-        th.Property("luid", th.StringType),
-        th.Property("name", th.StringType),
-        th.Property("description", th.StringType),
-        th.Property("createdAt", th.DateTimeType),
-        th.Property("siteLuid", th.StringType),
-        th.Property("projectName", th.StringType),
-        th.Property("projectVizportalUrlId", th.StringType),
-        th.Property("ownerId", th.StringType),
-        th.Property("uri", th.StringType),
-        th.Property("upstreamDatasources", th.ArrayType(
-            th.ObjectType(
-                th.Property("id", th.StringType),
-                th.Property("luid", th.StringType),
-                th.Property("name", th.StringType)
-            )
-        )),
-        th.Property("embeddedDatasources", th.ArrayType(
-            th.ObjectType(
-                th.Property("id", th.StringType),
-                th.Property("name", th.StringType)
-            )
-        )),
-    ).to_dict()
+
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
+            th.Property("id", th.StringType),
+            th.Property("luid", th.StringType),
+            th.Property("name", th.StringType),
+            th.Property("description", th.StringType),
+            th.Property("createdAt", th.DateTimeType),
+            th.Property("siteLuid", th.StringType),
+            th.Property("projectName", th.StringType),
+            th.Property("projectVizportalUrlId", th.StringType),
+            th.Property("ownerId", th.StringType),
+            th.Property("uri", th.StringType),
+            th.Property("upstreamDatasources", th.ArrayType(
+                th.ObjectType(
+                    th.Property("id", th.StringType),
+                    th.Property("luid", th.StringType),
+                    th.Property("name", th.StringType)
+                )
+            )),
+            th.Property("embeddedDatasources", th.ArrayType(
+                th.ObjectType(
+                    th.Property("id", th.StringType),
+                    th.Property("name", th.StringType)
+                )
+            )),
+        ).to_dict()
+
     primary_keys = ["id"]
     replication_key = None
+    root_field = "workbooks"
+    luid_source = "workbooks"
+    derived_fields = {
+        "siteLuid": SITE_LUID,
+        "ownerId": OWNER_ID,
+    }
 
-    @property
-    def query(self) -> str:
-        return """
-            query workbooks{
-                workbooks {
-                    id
-                    luid
-                    name
-                    description
-                    createdAt
-                    site {
-                        luid
-                    }
-                    projectName
-                    projectVizportalUrlId
-                    owner {
-                        id
-                    }
-                    uri
-                    upstreamDatasources {
-                        id
-                        luid
-                        name
-                    }
-                    embeddedDatasources {
-                        id
-                        name
-                    }
-                    }
-                }
-        """
-
-    def parse_response(self, response: requests.Response) -> Iterable[dict]:
-        resp_json = response.json()
-        for row in resp_json["data"]["workbooks"]:
-            row["siteLuid"] = row["site"]["luid"]
-            row["ownerId"] = row["owner"]["id"]
-            yield row
+    def parse_row(self, row: dict) -> dict:
+        row["siteLuid"] = row["site"]["luid"]
+        row["ownerId"] = row["owner"]["id"]
+        return row
 
 
 class PublishedDatasourcesMetadataStream(TableauMetadataStream):
     name = "published_datasources_metadata"
-    schema = th.PropertiesList(
-        th.Property("id", th.StringType),
-        th.Property("luid", th.StringType),
-        th.Property("name", th.StringType),
-        th.Property("hasUserReference", th.BooleanType),
-        th.Property("hasExtracts", th.BooleanType),
-        th.Property("siteLuid", th.StringType),
-        th.Property("fields", th.ArrayType(
-            th.ObjectType(
-                th.Property("id", th.StringType),
-                th.Property("name", th.StringType),
-                th.Property("fullyQualifiedName", th.StringType),
-                th.Property("upstreamTables", th.ArrayType(
-                    th.ObjectType(
-                        th.Property("id", th.StringType),
-                        th.Property("name", th.StringType)
-                    )
-                ))
-            )
-        )),
-        th.Property("upstreamTables", th.ArrayType(
-            th.ObjectType(
-                th.Property("id", th.StringType),
-                th.Property("name", th.StringType)
-            )
-        )),
-        th.Property("projectName", th.StringType),
-        th.Property("projectVizportalUrlId", th.StringType),
-        th.Property("ownerId", th.StringType),
-        th.Property("isCertified", th.BooleanType),
-        th.Property("certifierLuid", th.StringType),
-        th.Property("certificationNote", th.StringType),
-        th.Property("certifierDisplayName", th.StringType),
-        th.Property("description", th.StringType),
-        th.Property("downstreamWorkbooks", th.ArrayType(
-            th.ObjectType(
-                th.Property("id", th.StringType),
-                th.Property("luid", th.StringType),
-                th.Property("name", th.StringType)
-            )
-        )),
-    ).to_dict()
+
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
+            th.Property("id", th.StringType),
+            th.Property("luid", th.StringType),
+            th.Property("name", th.StringType),
+            th.Property("hasUserReference", th.BooleanType),
+            th.Property("hasExtracts", th.BooleanType),
+            th.Property("siteLuid", th.StringType),
+            th.Property("fields", th.ArrayType(
+                th.ObjectType(
+                    th.Property("id", th.StringType),
+                    th.Property("name", th.StringType),
+                    th.Property("fullyQualifiedName", th.StringType),
+                    th.Property("upstreamTables", th.ArrayType(
+                        th.ObjectType(
+                            th.Property("id", th.StringType),
+                            th.Property("name", th.StringType)
+                        )
+                    ))
+                )
+            )),
+            th.Property("upstreamTables", th.ArrayType(
+                th.ObjectType(
+                    th.Property("id", th.StringType),
+                    th.Property("name", th.StringType)
+                )
+            )),
+            th.Property("projectName", th.StringType),
+            th.Property("projectVizportalUrlId", th.StringType),
+            th.Property("ownerId", th.StringType),
+            th.Property("isCertified", th.BooleanType),
+            th.Property("certifierLuid", th.StringType),
+            th.Property("certificationNote", th.StringType),
+            th.Property("certifierDisplayName", th.StringType),
+            th.Property("description", th.StringType),
+            th.Property("downstreamWorkbooks", th.ArrayType(
+                th.ObjectType(
+                    th.Property("id", th.StringType),
+                    th.Property("luid", th.StringType),
+                    th.Property("name", th.StringType)
+                )
+            )),
+        ).to_dict()
+
     primary_keys = ["id"]
     replication_key = None
+    root_field = "publishedDatasources"
+    shardable = True
+    luid_source = "datasources"
+    derived_fields = {
+        "siteLuid": SITE_LUID,
+        "ownerId": OWNER_LUID,
+        "certifierLuid": CERTIFIER_LUID,
+    }
+
+    def parse_row(self, row: dict) -> dict:
+        row["siteLuid"] = row["site"]["luid"]
+        row["ownerLuid"] = row["owner"]["luid"]
+        row["certifierLuid"] = row["owner"]["luid"]
+        return row
 
-    @property
-    def query(self) -> str:
-        return """
-            query published_datasources{
-              publishedDatasources {
-                id
-                luid
-                name
-                hasUserReference
-                hasExtracts
-                extractLastRefreshTime
-                site{
-                    luid
-                }
-                fields {
-                  id
-                  name
-                  fullyQualifiedName
-                  upstreamTables {
-                    id
-                    name
-                  }
-                }
-                upstreamTables {
-                  id
-                  name
-                }
-                projectName
-                projectVizportalUrlId
-                owner{
-                  luid
-                }
-                isCertified
-                certifier {
-                  luid
-                }
-                certificationNote
-                certifierDisplayName
-                description
-                downstreamWorkbooks {
-                    id
-                    luid
-                    name
-                }
-              }
-            }
-        """
-
-    def parse_response(self, response: requests.Response) -> Iterable[dict]:
-        resp_json = response.json()
-        for row in resp_json["data"]["publishedDatasources"]:
-            row["siteLuid"] = row["site"]["luid"]
-            row["ownerLuid"] = row["owner"]["luid"]
-            row["certifierLuid"] = row["owner"]["luid"]
-            yield row
 
 class EmbeddedDatasourcesMetadataStream(TableauMetadataStream):
     name = "embedded_datasources_metadata"
-    schema = th.PropertiesList(
-        th.Property("id", th.StringType),
-        th.Property("name", th.StringType),
-        th.Property("hasUserReference", th.BooleanType),
-        th.Property("hasExtracts", th.BooleanType),
-        th.Property("extractLastRefreshTime", th.DateTimeType),
-        th.Property("extractLastUpdateTime", th.DateTimeType),
-        th.Property("workbook", th.ArrayType(
-            th.ObjectType(
-                th.Property("id", th.StringType),
-                th.Property("luid", th.StringType),
-                th.Property("name", th.StringType),
-                th.Property("projectName", th.StringType),
-                th.Property("owner", th.ArrayType(
-                    th.ObjectType(
-                        th.Property("name", th.StringType),
-                        th.Property("username", th.StringType)
-                    )
-                ))
-            )
-        ))
-    ).to_dict()
-    primary_keys = ["id"]
-    replication_key = None
 
-    @property
-    def query(self) -> str:
-        return """
-            query embedded_datasources{
-                embeddedDatasources {
-                    id
-                    name
-                    hasUserReference
-                    hasExtracts
-                    extractLastRefreshTime
-                    extractLastUpdateTime
-                    workbook {
-                        id
-                        luid
-                        name
-                        projectName
-                        owner {
-                            name
-                            username
-                        }
-                    }
-                }
-            }
-        """
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
+            th.Property("id", th.StringType),
+            th.Property("name", th.StringType),
+            th.Property("hasUserReference", th.BooleanType),
+            th.Property("hasExtracts", th.BooleanType),
+            th.Property("extractLastRefreshTime", th.DateTimeType),
+            th.Property("extractLastUpdateTime", th.DateTimeType),
+            th.Property("workbook", th.ArrayType(
+                th.ObjectType(
+                    th.Property("id", th.StringType),
+                    th.Property("luid", th.StringType),
+                    th.Property("name", th.StringType),
+                    th.Property("projectName", th.StringType),
+                    th.Property("owner", th.ArrayType(
+                        th.ObjectType(
+                            th.Property("name", th.StringType),
+                            th.Property("username", th.StringType)
+                        )
+                    ))
+                )
+            ))
+        ).to_dict()
 
-    def parse_response(self, response: requests.Response) -> Iterable[dict]:
-        resp_json = response.json()
-        for row in resp_json["data"]["embeddedDatasources"]:
-            yield row
+    primary_keys = ["id"]
+    replication_key = None
+    root_field = "embeddedDatasources"
 
 
 class CustomSQLLocationsMetadataStream(TableauMetadataStream):
     name = "custom_sql_locations_metadata"
-    schema = th.PropertiesList(
-        th.Property("id", th.StringType),
-        th.Property("name", th.StringType),
-        th.Property("downstreamWorkbooks", th.ArrayType(
-            th.ObjectType(
-                th.Property("id", th.StringType),
-                th.Property("name", th.StringType)
-            )
-        )),
-        th.Property("query", th.StringType)
-    ).to_dict()
-    primary_keys = ["id"]
-    replication_key = None
 
-    @property
-    def query(self) -> str:
-        return """
-            query listCustomSQLTables {
-                customSQLTables {
-                  name
-                  id
-                  query
-                  downstreamWorkbooks {
-                   id
-                   name
-                  }
-               }
-            }
-        """
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
+            th.Property("id", th.StringType),
+            th.Property("name", th.StringType),
+            th.Property("downstreamWorkbooks", th.ArrayType(
+                th.ObjectType(
+                    th.Property("id", th.StringType),
+                    th.Property("name", th.StringType)
+                )
+            )),
+            th.Property("query", th.StringType)
+        ).to_dict()
 
-    def parse_response(self, response: requests.Response) -> Iterable[dict]:
-        resp_json = response.json()
-        for row in resp_json["data"]["customSQLTables"]:
-            yield row
+    primary_keys = ["id"]
+    replication_key = None
+    root_field = "customSQLTables"
 
 
 class UsersMetadataStream(TableauMetadataStream):
     name = "users_metadata"
-    schema = th.PropertiesList(
-        th.Property("id", th.StringType),
-        th.Property("name", th.StringType),
-    ).to_dict()
-    primary_keys = ["id"]
-    replication_key = None
 
-    @property
-    def query(self) -> str:
-        return """
-            query users {
-                tableauUsers {
-                    name
-                    id
-                }
-            }
-        """
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
+            th.Property("id", th.StringType),
+            th.Property("name", th.StringType),
+        ).to_dict()
 
-    def parse_response(self, response: requests.Response) -> Iterable[dict]:
-        resp_json = response.json()
-        for row in resp_json["data"]["tableauUsers"]:
-            yield row
+    primary_keys = ["id"]
+    replication_key = None
+    root_field = "tableauUsers"
 
 
 class CalculatedFieldsMetadataStream(TableauMetadataStream):
     name = "calculated_fields_metadata"
-    schema = th.PropertiesList(
-        th.Property("id", th.StringType),
-        th.Property("name", th.StringType),
-        th.Property("description", th.StringType),
-        th.Property("dataType", th.StringType),
-        th.Property("formula", th.StringType),
-        th.Property("aggregation", th.StringType),
-        th.Property("isAutoGenerated", th.BooleanType),
-        th.Property("fields", th.ArrayType(
-            th.ObjectType(
-                th.Property("id", th.StringType),
-                th.Property("name", th.StringType),
-                th.Property("upstreamDatabases", th.ArrayType(
-                    th.ObjectType(
-                        th.Property("id", th.StringType),
-                        th.Property("name", th.StringType)
-                    )
-                )),
-            )
-        )),
-        th.Property("referencedByCalculations", th.ArrayType(
-            th.ObjectType(
-                th.Property("name", th.StringType),
-                th.Property("formula", th.StringType)
-            )
-        )),
-        th.Property("upstreamColumns", th.ArrayType(
-            th.ObjectType(
-                th.Property("id", th.StringType),
-                th.Property("name", th.StringType)
-            )
-        )),
-        th.Property("upstreamTables", th.ArrayType(
-            th.ObjectType(
-                th.Property("id", th.StringType),
-                th.Property("name", th.StringType)
-            )
-        )),
-        th.Property("upstreamDatabases", th.ArrayType(
-            th.ObjectType(
-                th.Property("id", th.StringType),
-                th.Property("name", th.StringType)
-            )
-        )),
-        th.Property("downstreamSheets", th.ArrayType(
-            th.ObjectType(
-                th.Property("id", th.StringType),
-                th.Property("name", th.StringType)
-            )
-        )),
-        th.Property("downstreamDashboards", th.ArrayType(
-            th.ObjectType(
-                th.Property("id", th.StringType),
-                th.Property("name", th.StringType)
-            )
-        )),
-        th.Property("downstreamWorkbooks", th.ArrayType(
-            th.ObjectType(
-                th.Property("id", th.StringType),
-                th.Property("luid", th.StringType),
-                th.Property("name", th.StringType),
-                th.Property("projectName", th.StringType)
-            )
-        ))
-    ).to_dict()
-    primary_keys = ["id"]
-    replication_key = None
 
-    @property
-    def query(self) -> str:
-        return """
-            query calculations {
-                calculatedFields {
-                    id
-                    name
-                    description
-                    dataType
-                    formula
-                    aggregation
-                    isAutoGenerated
-                    fields {
-                      id
-                      name
-                      upstreamDatabases {
-                        name
-                      }
-                    }
-                    referencedByCalculations {
-                      name
-                      formula
-                    }
-                    upstreamColumns {
-                      id
-                      name
-                    }
-                    upstreamTables {
-                      id
-                      name
-                    }
-                    upstreamDatabases {
-                      id
-                      name
-                    }
-                    downstreamSheets {
-                      id
-                      name
-                    }
-                    downstreamDashboards{
-                      id
-                      name
-                    }
-                    downstreamWorkbooks {
-                      id
-                      luid
-                      name
-                      projectName
-                    }
-                }
-            }
-        """
+    @cached_schema
+    def schema(cls) -> dict:
+        return th.PropertiesList(
+            th.Property("id", th.StringType),
+            th.Property("name", th.StringType),
+            th.Property("description", th.StringType),
+            th.Property("dataType", th.StringType),
+            th.Property("formula", th.StringType),
+            th.Property("aggregation", th.StringType),
+            th.Property("isAutoGenerated", th.BooleanType),
+            th.Property("fields", th.ArrayType(
+                th.ObjectType(
+                    th.Property("id", th.StringType),
+                    th.Property("name", th.StringType),
+                    th.Property("upstreamDatabases", th.ArrayType(
+                        th.ObjectType(
+                            th.Property("id", th.StringType),
+                            th.Property("name", th.StringType)
+                        )
+                    )),
+                )
+            )),
+            th.Property("referencedByCalculations", th.ArrayType(
+                th.ObjectType(
+                    th.Property("name", th.StringType),
+                    th.Property("formula", th.StringType)
+                )
+            )),
+            th.Property("upstreamColumns", th.ArrayType(
+                th.ObjectType(
+                    th.Property("id", th.StringType),
+                    th.Property("name", th.StringType)
+                )
+            )),
+            th.Property("upstreamTables", th.ArrayType(
+                th.ObjectType(
+                    th.Property("id", th.StringType),
+                    th.Property("name", th.StringType)
+                )
+            )),
+            th.Property("upstreamDatabases", th.ArrayType(
+                th.ObjectType(
+                    th.Property("id", th.StringType),
+                    th.Property("name", th.StringType)
+                )
+            )),
+            th.Property("downstreamSheets", th.ArrayType(
+                th.ObjectType(
+                    th.Property("id", th.StringType),
+                    th.Property("name", th.StringType)
+                )
+            )),
+            th.Property("downstreamDashboards", th.ArrayType(
+                th.ObjectType(
+                    th.Property("id", th.StringType),
+                    th.Property("name", th.StringType)
+                )
+            )),
+            th.Property("downstreamWorkbooks", th.ArrayType(
+                th.ObjectType(
+                    th.Property("id", th.StringType),
+                    th.Property("luid", th.StringType),
+                    th.Property("name", th.StringType),
+                    th.Property("projectName", th.StringType)
+                )
+            ))
+        ).to_dict()
 
-    def parse_response(self, response: requests.Response) -> Iterable[dict]:
-        resp_json = response.json()
-        for row in resp_json["data"]["calculatedFields"]:
-            yield row
+    primary_keys = ["id"]
+    replication_key = None
+    root_field = "calculatedFields"
+    shardable = True
@@ -1,18 +1,29 @@
 """Tableau tap class."""
 
-from typing import List
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-import tableauserverclient as TSC
 from singer_sdk import Tap, Stream
 from singer_sdk.helpers._compat import final
 from singer_sdk import typing as th  # JSON schema typing helpers
+from tap_tableau.cache import install_http_cache
+from tap_tableau.client import TableauMetadataStream
+from tap_tableau.client import TableauStream
+from tap_tableau.concurrency import AdaptiveConcurrency
+from tap_tableau.project_tree import ProjectTree
+from tap_tableau.session import configure_session
 from tap_tableau.streams import (
     DatasourcesStream,
     GroupsStream,
     ProjectsStream,
     SchedulesStream,
     TasksStream,
+    UsersStream,
     WorkbooksStream,
+    DatasourceConnectionsStream,
+    DatasourcePermissionsStream,
+    WorkbookConnectionsStream,
+    WorkbookPermissionsStream,
+    PermissionRulesStream,
     CustomSQLLocationsMetadataStream,
     PublishedDatasourcesMetadataStream,
     EmbeddedDatasourcesMetadataStream,
@@ -20,13 +31,24 @@ from tap_tableau.streams import (
     WorkbooksMetadataStream,
     CalculatedFieldsMetadataStream,
 )
+from tap_tableau.writer import record_writer
+
+if TYPE_CHECKING:
+    import tableauserverclient as TSC
+
 STREAM_TYPES = [
     DatasourcesStream,
     GroupsStream,
     ProjectsStream,
     SchedulesStream,
     TasksStream,
+    UsersStream,
     WorkbooksStream,
+    DatasourceConnectionsStream,
+    DatasourcePermissionsStream,
+    WorkbookConnectionsStream,
+    WorkbookPermissionsStream,
+    PermissionRulesStream,
 ]
 METADATA_STREAM_TYPES = [
     CalculatedFieldsMetadataStream,
@@ -38,9 +60,23 @@ METADATA_STREAM_TYPES = [
 ]
 
 
+def log_estimates(logger, estimates: list) -> None:
+    """Log the projected records, API calls and runtime of each stream from a dry run, and their total."""
+    totals = {"records": 0, "calls": 0, "seconds": 0.0}
+    for estimate in estimates:
+        if estimate is None:
+            continue
+        logger.info("Dry run '{stream}': {records} records, ~{calls} API calls, ~{seconds:.0f}s".format(**estimate))
+        for key in totals:
+            totals[key] += estimate[key]
+    logger.info("Dry run total: {records} records, ~{calls} API calls, ~{seconds:.0f}s".format(**totals))
+
+
 class TapTableau(Tap):
     """Tableau tap class."""
     name = "tap-tableau"
+    # Set to a dict when REST ids should be shared with the metadata streams
+    shared_ids: Optional[Dict[str, set]] = None
 
     config_jsonschema = th.PropertiesList(
         th.Property(
@@ -71,28 +107,164 @@ class TapTableau(Tap):
             required=True,
             description="Personal access token for authentication"
         ),
+        th.Property(
+            "start_date",
+            th.DateTimeType,
+            description="Earliest last login to sync users from on the first incremental run"
+        ),
+        th.Property(
+            "users_full_sync_days",
+            th.IntegerType,
+            description="Sync every user instead of those who logged in since the bookmark once this many days have passed since the last full sync"
+        ),
+        th.Property(
+            "dry_run",
+            th.BooleanType,
+            description="Read only the first page of each stream and log the projected records, API calls and runtime"
+        ),
+        th.Property(
+            "max_records_per_stream",
+            th.IntegerType,
+            description="Stop each stream after this many records, e.g. for CI"
+        ),
+        th.Property(
+            "record_queue_max_records",
+            th.IntegerType,
+            description="Fetch records on a background thread, buffering at most this many before fetchers wait for the writer"
+        ),
+        th.Property(
+            "record_queue_max_bytes",
+            th.IntegerType,
+            description="Fetch records on a background thread, buffering at most this many bytes of records before fetchers wait"
+        ),
+        th.Property(
+            "fast_record_writer",
+            th.BooleanType,
+            description="Encode records with orjson when installed and write them to stdout in 64KB blocks"
+        ),
+        th.Property(
+            "trusted_streams",
+            th.ArrayType(th.StringType),
+            description="Streams whose records skip type conforming under fast_record_writer"
+        ),
+        th.Property(
+            "trusted_streams_validate_every",
+            th.IntegerType,
+            description="Conform every Nth record of a trusted stream, trusting it no more if one needed conforming"
+        ),
+        th.Property(
+            "http_timeout",
+            th.NumberType,
+            description="Seconds to wait for a response before failing a request (default 300)"
+        ),
+        th.Property(
+            "http_compression",
+            th.BooleanType,
+            description="Ask for compressed responses (default true)"
+        ),
+        th.Property(
+            "http_cache_dir",
+            th.StringType,
+            description="Directory to record HTTP responses to and replay them from, disabled if unset"
+        ),
+        th.Property(
+            "http_cache_ttl",
+            th.IntegerType,
+            description="Seconds a cached response stays fresh before it is fetched again"
+        ),
+        th.Property(
+            "http_cache_mode",
+            th.StringType,
+            description="'readwrite' to refetch stale or missing entries, 'offline' to serve only from the cache"
+        ),
+        th.Property(
+            "max_concurrency",
+            th.IntegerType,
+            description="Upper bound on concurrent per-item requests, the level in use is tuned automatically (default 8)"
+        ),
+        th.Property(
+            "target_latency_p95",
+            th.NumberType,
+            description="p95 request latency in seconds above which concurrency is backed off (default 2)"
+        ),
+        th.Property(
+            "split_child_streams",
+            th.BooleanType,
+            description="Emit datasource and workbook connections and permissions to their own child streams instead of embedding them"
+        ),
+        th.Property(
+            "detect_deletions",
+            th.BooleanType,
+            description="Compare the datasource and workbook ids listed each run with the previous run's and emit records with _sdc_deleted_at for ids that disappeared"
+        ),
+        th.Property(
+            "normalize_permissions",
+            th.BooleanType,
+            description="Emit each distinct permission rule set once to the permission_rules stream and reference it by id from content records"
+        ),
     ).to_dict()
 
     def discover_streams(self) -> List[Stream]:
         """Return a list of discovered streams."""
         return [stream_class(tap=self) for stream_class in STREAM_TYPES]
 
+    def get_server_client(self) -> "TSC.Server":
+        """Return a TSC server client with its session pooled and the HTTP cache installed before any request is made."""
+        import tableauserverclient as TSC
+
+        server_client = TSC.Server(self.config['server_url'])
+        configure_session(server_client._session, self.config)
+        install_http_cache(server_client._session, self.config)
+        if self.config.get('api_version'):
+            server_client.version = self.config['api_version']
+        else:
+            server_client.use_server_version()
+        return server_client
+
+    def get_sync_order(self) -> List[Stream]:
+        """Return the streams in the order they sync.
+
+        The SDK orders streams by name, so the permission rules, collected while the content streams sync, are moved last.
+        """
+        return sorted(self.streams.values(), key=lambda stream: isinstance(stream, PermissionRulesStream))
+
     # Not ideal to override this method, but running multiple streams fails if pushed down so watch for timeout issues
     @final
     def sync_all(self) -> None:
         """Sync all streams."""
+        import tableauserverclient as TSC
+
         self._reset_state_progress_markers()
         self._set_compatible_replication_methods()
         stream: "Stream"
         authentication = TSC.PersonalAccessTokenAuth(self.config['personal_access_token_name'], self.config['personal_access_token_secret'], site_id=self.config.get('site_url_id'))
-        server_client = TSC.Server(self.config['server_url'], self.config['api_version']) if self.config.get('api_version') else TSC.Server(self.config['server_url'], use_server_version=True)
+        server_client = self.get_server_client()
         if not server_client.is_signed_in():
             server_client.auth.sign_in(authentication)
+        permission_rules: dict = {}
+        concurrency = AdaptiveConcurrency(
+            max_workers=self.config.get('max_concurrency', 8),
+            target_p95=self.config.get('target_latency_p95', 2.0),
+            logger=self.logger,
+        )
+        concurrency.watch(server_client._session)
+        project_tree = ProjectTree(lambda: TSC.Pager(server_client.projects))
+        estimates: list = []
+        # Child streams are synced from their parents, so every stream is set up before any syncs
         for stream in self.streams.values():
+            if isinstance(stream, TableauMetadataStream):
+                stream.api_token = server_client.auth_token
+                stream.shared_ids = self.shared_ids
+            elif isinstance(stream, TableauStream):
+                stream.server_client = server_client
+                stream.permission_rules = permission_rules
+                stream.concurrency = concurrency
+                stream.project_tree = project_tree
+                stream.shared_ids = self.shared_ids
+        for stream in self.get_sync_order():
             if not stream.selected and not stream.has_selected_descendents:
                 self.logger.info(f"Skipping deselected stream '{stream.name}'.")
                 continue
-            stream.server_client = server_client
             if stream.parent_stream_type:
                 self.logger.debug(
                     f"Child stream '{type(stream).__name__}' is expected to be called "
@@ -100,9 +272,16 @@ class TapTableau(Tap):
                     "Skipping direct invocation."
                 )
                 continue
+            if self.config.get('dry_run'):
+                if isinstance(stream, (TableauStream, TableauMetadataStream)):
+                    estimates.append(stream.estimate())
+                continue
 
             stream.sync()
             stream.finalize_state_progress_markers()
+        record_writer.flush()
+        if self.config.get('dry_run'):
+            log_estimates(self.logger, estimates)
 
 
 class TapTableauMetadata(Tap):
@@ -138,8 +317,124 @@ class TapTableauMetadata(Tap):
             required=True,
             description="Personal access token for authentication"
         ),
+        th.Property(
+            "dry_run",
+            th.BooleanType,
+            description="Read only the first page of each stream and log the projected records, API calls and runtime"
+        ),
+        th.Property(
+            "max_records_per_stream",
+            th.IntegerType,
+            description="Stop each stream after this many records, e.g. for CI"
+        ),
+        th.Property(
+            "record_queue_max_records",
+            th.IntegerType,
+            description="Fetch records on a background thread, buffering at most this many before fetchers wait for the writer"
+        ),
+        th.Property(
+            "record_queue_max_bytes",
+            th.IntegerType,
+            description="Fetch records on a background thread, buffering at most this many bytes of records before fetchers wait"
+        ),
+        th.Property(
+            "fast_record_writer",
+            th.BooleanType,
+            description="Encode records with orjson when installed and write them to stdout in 64KB blocks"
+        ),
+        th.Property(
+            "trusted_streams",
+            th.ArrayType(th.StringType),
+            description="Streams whose records skip type conforming under fast_record_writer"
+        ),
+        th.Property(
+            "trusted_streams_validate_every",
+            th.IntegerType,
+            description="Conform every Nth record of a trusted stream, trusting it no more if one needed conforming"
+        ),
+        th.Property(
+            "http_timeout",
+            th.NumberType,
+            description="Seconds to wait for a response before failing a request (default 300)"
+        ),
+        th.Property(
+            "http_compression",
+            th.BooleanType,
+            description="Ask for compressed responses (default true)"
+        ),
+        th.Property(
+            "http_cache_dir",
+            th.StringType,
+            description="Directory to record HTTP responses to and replay them from, disabled if unset"
+        ),
+        th.Property(
+            "http_cache_ttl",
+            th.IntegerType,
+            description="Seconds a cached response stays fresh before it is fetched again"
+        ),
+        th.Property(
+            "http_cache_mode",
+            th.StringType,
+            description="'readwrite' to refetch stale or missing entries, 'offline' to serve only from the cache"
+        ),
+        th.Property(
+            "metadata_page_size",
+            th.IntegerType,
+            description="Rows requested per page of a metadata query (default 100)"
+        ),
+        th.Property(
+            "metadata_shards",
+            th.IntegerType,
+            description="Split calculated fields and published datasources into this many id shards fetched in a process pool"
+        ),
+        th.Property(
+            "metadata_processes",
+            th.IntegerType,
+            description="Worker processes used for sharded metadata fetches, defaults to the CPU count"
+        ),
     ).to_dict()
 
     def discover_streams(self) -> List[Stream]:
         """Return a list of discovered streams."""
         return [stream_class(tap=self) for stream_class in METADATA_STREAM_TYPES]
+
+    @final
+    def sync_all(self) -> None:
+        """Sync all streams, or only log their projected cost when `dry_run` is set."""
+        if not self.config.get("dry_run"):
+            super().sync_all()
+            record_writer.flush()
+            return
+        log_estimates(self.logger, [
+            stream.estimate()
+            for stream in self.streams.values()
+            if stream.selected and isinstance(stream, TableauMetadataStream)
+        ])
+
+
+class TapTableauCombined(TapTableau):
+    """Tableau tap serving both the REST and metadata streams from one session."""
+    name = "tap-tableau-combined"
+
+    config_jsonschema = {
+        **TapTableau.config_jsonschema,
+        "properties": {
+            **TapTableau.config_jsonschema["properties"],
+            **TapTableauMetadata.config_jsonschema["properties"],
+        },
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.shared_ids = {}
+
+    def discover_streams(self) -> List[Stream]:
+        """Return a list of discovered streams."""
+        return [stream_class(tap=self) for stream_class in STREAM_TYPES + METADATA_STREAM_TYPES]
+
+    def get_sync_order(self) -> List[Stream]:
+        """Return the streams in the order they sync, every REST stream before the metadata streams.
+
+        The metadata streams only query the ids the REST streams synced, so they must run after them.
+        """
+        return sorted(super().get_sync_order(), key=lambda stream: isinstance(stream, TableauMetadataStream))
@@ -0,0 +1,44 @@
+"""Tests for the bounded record queue."""
+
+import threading
+
+import pytest
+
+from tap_tableau.backpressure import BoundedRecordQueue, buffer_records
+
+
+def test_records_pass_through_in_order():
+    records = [{"id": i} for i in range(100)]
+    assert list(buffer_records(iter(records), max_records=5, max_bytes=100)) == records
+
+
+def test_producer_blocks_when_full():
+    queue = BoundedRecordQueue(max_records=2)
+    assert queue.put({"id": 1})
+    assert queue.put({"id": 2})
+    blocked = threading.Thread(target=queue.put, args=({"id": 3},))
+    blocked.start()
+    blocked.join(0.1)
+    assert blocked.is_alive()
+    assert queue.max_depth == 2
+
+    queue.cancel()
+    blocked.join(1)
+    assert not blocked.is_alive()
+
+
+def test_producer_errors_reach_the_consumer():
+    def failing_records():
+        yield {"id": 1}
+        raise ValueError("fetch failed")
+
+    with pytest.raises(ValueError):
+        list(buffer_records(failing_records(), max_records=5))
+
+
+def test_unsampled_records_count_as_the_average_sampled_size():
+    queue = BoundedRecordQueue(max_bytes=1000)
+    queue.size_sample_every = 3
+    queue.put({"id": "a"})
+    queue.put({"id": "a" * 100})
+    assert queue.max_depth_bytes == 2 * len('{"id": "a"}')
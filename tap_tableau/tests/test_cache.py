@@ -0,0 +1,78 @@
+"""Tests for the HTTP record/replay cache."""
+
+import json
+import time
+
+import requests
+
+from tap_tableau.cache import HTTPCache
+
+
+def _make_response(content: bytes) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response.url = "https://example.com/api/metadata/graphql"
+    response._content = content
+    return response
+
+
+def test_key_depends_on_method_url_and_body():
+    key = HTTPCache.get_key("POST", "https://example.com", b'{"query": "a"}')
+    assert key == HTTPCache.get_key("post", "https://example.com", b'{"query": "a"}')
+    assert key != HTTPCache.get_key("POST", "https://example.com", b'{"query": "b"}')
+    assert key != HTTPCache.get_key("GET", "https://example.com", b'{"query": "a"}')
+
+
+def test_stale_entries_are_only_served_offline(tmp_path):
+    cache = HTTPCache(str(tmp_path), ttl=60)
+    key = cache.get_key("GET", "https://example.com", None)
+    cache.set(key, _make_response(b"{}"))
+    assert cache.get(key)["status_code"] == 200
+
+    entry_path = cache._path(key)
+    entry = json.loads(entry_path.read_text())
+    entry["stored_at"] = time.time() - 120
+    entry_path.write_text(json.dumps(entry))
+    assert cache.get(key) is None
+    assert HTTPCache(str(tmp_path), ttl=60, mode="offline").get(key) is not None
+
+
+def test_sessions_are_pooled_for_concurrency(tmp_path):
+    from tap_tableau.cache import install_http_cache
+    from tap_tableau.session import configure_session
+
+    session = requests.Session()
+    config = {"max_concurrency": 16, "http_timeout": 60, "http_compression": False}
+    configure_session(session, config)
+    adapter = session.get_adapter("https://example.com")
+    assert adapter._pool_maxsize == 18
+    assert adapter.timeout == (10, 60)
+    assert session.headers["Accept-Encoding"] == "identity"
+
+    install_http_cache(session, {**config, "http_cache_dir": str(tmp_path)})
+    assert session.get_adapter("https://example.com")._pool_maxsize == 18
+
+
+def test_key_depends_on_site():
+    key = HTTPCache.get_key("POST", "https://example.com/api/metadata/graphql", b"{}", "site-a")
+    assert key != HTTPCache.get_key("POST", "https://example.com/api/metadata/graphql", b"{}", "site-b")
+
+
+def test_sign_in_is_never_cached(tmp_path, monkeypatch):
+    from tap_tableau.cache import CachingHTTPAdapter
+
+    cache = HTTPCache(str(tmp_path), site="site-a")
+    adapter = CachingHTTPAdapter(cache)
+    sent = []
+
+    def send(self, request, *args, **kwargs):
+        sent.append(request.url)
+        return _make_response(b'{"credentials": {"token": "secret"}}')
+
+    monkeypatch.setattr(requests.adapters.HTTPAdapter, "send", send)
+    request = requests.Request("POST", "https://example.com/api/3.15/auth/signin", data=b"{}").prepare()
+    adapter.send(request)
+    adapter.send(request)
+    assert len(sent) == 2
+    assert not list(tmp_path.glob("*/*.json"))
@@ -0,0 +1,66 @@
+"""Tests for the adaptive concurrency controller."""
+
+import datetime
+
+import pytest
+import requests
+
+from tap_tableau.concurrency import AdaptiveConcurrency
+
+
+def test_limit_grows_additively_and_halves_on_slow_windows():
+    controller = AdaptiveConcurrency(max_workers=4, target_p95=1.0, window_size=2)
+    for _ in range(10):
+        controller.record(0.1)
+    assert controller.limit == 4
+
+    controller.record(5.0)
+    controller.record(5.0)
+    assert controller.limit == 2
+
+
+def test_limit_halves_on_errors():
+    controller = AdaptiveConcurrency(max_workers=4, window_size=2)
+    controller.limit = 4
+    controller.record(0.1, error=True)
+    controller.record(0.1)
+    assert controller.limit == 2
+
+
+def test_map_preserves_order():
+    controller = AdaptiveConcurrency(max_workers=4, window_size=2)
+    assert list(controller.map(lambda item: item * 2, range(20))) == [item * 2 for item in range(20)]
+
+
+def test_throttled_items_are_retried_and_counted():
+    controller = AdaptiveConcurrency(max_workers=2, window_size=4, retry_backoff=0)
+    controller.limit = 2
+    attempts = []
+
+    def fetch(item):
+        attempts.append(item)
+        response = requests.Response()
+        response.status_code = 429 if attempts.count(item) == 1 else 200
+        response.elapsed = datetime.timedelta(seconds=0.1)
+        controller._on_response(response)
+        if response.status_code == 429:
+            raise RuntimeError("Too many requests")
+        return item
+
+    controller._watching = True
+    assert list(controller.map(fetch, range(2))) == [0, 1]
+    assert sorted(attempts) == [0, 0, 1, 1]
+    assert controller.limit == 1
+
+
+def test_other_errors_are_not_retried():
+    controller = AdaptiveConcurrency(retry_backoff=0)
+    attempts = []
+
+    def fetch(item):
+        attempts.append(item)
+        raise ValueError("bad row")
+
+    with pytest.raises(ValueError):
+        list(controller.map(fetch, [1]))
+    assert attempts == [1]
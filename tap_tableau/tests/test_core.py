@@ -24,3 +24,179 @@ def test_standard_tap_tests():
 
 
 # TODO: Create additional tests as appropriate for your tap.
+
+TAP_CONFIG = {
+    "server_url": "https://tableau.example.com",
+    "api_version": "3.15",
+    "site_url_id": "site",
+    "personal_access_token_name": "name",
+    "personal_access_token_secret": "secret",
+}
+
+
+def test_permission_rule_id_ignores_order():
+    """Permission rule sets hash the same whatever order the server returns them in."""
+    from tap_tableau.utils import get_permission_rule_id
+
+    user_rule = {"capabilities": {"Read": "Allow"}, "grantee_id": "u1", "grantee_tag_name": "user"}
+    group_rule = {"capabilities": {"Read": "Allow", "Write": "Deny"}, "grantee_id": "g1", "grantee_tag_name": "group"}
+    assert get_permission_rule_id([user_rule, group_rule]) == get_permission_rule_id([group_rule, user_rule])
+    assert get_permission_rule_id([user_rule]) != get_permission_rule_id([group_rule])
+
+
+def test_combined_tap_narrows_metadata_queries_by_rest_ids(monkeypatch):
+    """Ids emitted by a REST stream filter the matching metadata stream's query with luidWithin."""
+    from tap_tableau.streams import WorkbooksStream
+    from tap_tableau.tap import TapTableauCombined
+
+    tap = TapTableauCombined(config=TAP_CONFIG, parse_env_config=False)
+    rest_stream = tap.streams["workbooks"]
+    metadata_stream = tap.streams["workbooks_metadata"]
+    for stream in (rest_stream, metadata_stream):
+        stream.shared_ids = tap.shared_ids
+    assert "luidWithin" not in metadata_stream.query
+
+    monkeypatch.setattr(WorkbooksStream, "request_records", lambda self, context: iter([{"id": "b"}, {"id": "a"}]))
+    assert [row["id"] for row in rest_stream.get_records(None)] == ["b", "a"]
+
+    assert "workbooksConnection(first: $first, after: $after, filter: {luidWithin: $luids})" in metadata_stream.query
+    payload = metadata_stream.prepare_request_payload(None, None)
+    assert payload["variables"] == {"first": 100, "after": None, "luids": ["a", "b"]}
+
+
+def test_combined_tap_syncs_rest_streams_before_metadata_streams(monkeypatch):
+    """Metadata streams sync after every REST stream, whose ids they are narrowed by."""
+    from types import SimpleNamespace
+
+    import requests
+
+    from tap_tableau.client import TableauMetadataStream
+    from tap_tableau.client import TableauStream
+    from tap_tableau.tap import TapTableauCombined
+
+    synced = []
+    for stream_class in (TableauStream, TableauMetadataStream):
+        monkeypatch.setattr(stream_class, "sync", lambda self, context=None: synced.append(self))
+    server_client = SimpleNamespace(is_signed_in=lambda: True, _session=requests.Session(), auth_token="token")
+    monkeypatch.setattr(TapTableau, "get_server_client", lambda self: server_client)
+
+    TapTableauCombined(config=TAP_CONFIG, parse_env_config=False).sync_all()
+    kinds = [isinstance(stream, TableauMetadataStream) for stream in synced]
+    assert any(kinds) and not all(kinds)
+    assert kinds == sorted(kinds)
+
+
+def test_users_who_never_logged_in_are_skipped(monkeypatch):
+    """A full users sync skips users with a null last_login, bookmarks the latest login and records the full sync."""
+    from tap_tableau.streams import UsersStream
+
+    users = [
+        {"id": "1", "last_login": "2022-05-01T00:00:00.000000Z"},
+        {"id": "2", "last_login": None},
+        {"id": "3", "last_login": "2022-06-01T00:00:00.000000Z"},
+    ]
+    monkeypatch.setattr(UsersStream, "request_records", lambda self, context: iter(users))
+    stream = TapTableau(config=TAP_CONFIG, parse_env_config=False).streams["users"]
+    assert [row["id"] for row in stream.get_records(None)] == ["1", "3"]
+    stream.sync()
+    stream.finalize_state_progress_markers()
+    assert stream.stream_state["replication_key_value"] == "2022-06-01T00:00:00.000000Z"
+
+
+def test_child_streams_are_opt_in():
+    """Connections and permissions stay embedded in their parents unless split_child_streams is set."""
+    tap = TapTableau(config=TAP_CONFIG, parse_env_config=False)
+    assert not tap.streams["datasource_connections"].selected
+    assert tap.streams["datasources"].get_selected_child("datasource_connections") is None
+
+    tap = TapTableau(config={**TAP_CONFIG, "split_child_streams": True}, parse_env_config=False)
+    assert tap.streams["datasource_connections"].selected
+
+
+def test_permission_rules_sync_after_every_content_stream(monkeypatch, capsys):
+    """Every rule id referenced by a content record has a permission_rules row, whatever the SDK's stream order."""
+    import json
+    from types import SimpleNamespace
+
+    import requests
+
+    from tap_tableau.tap import STREAM_TYPES
+    from tap_tableau.streams import PermissionRulesStream
+
+    def rule(grantee_id):
+        return [{"capabilities": {"Read": "Allow"}, "grantee_id": grantee_id, "grantee_tag_name": "user"}]
+
+    rows = {
+        "datasources": [{"id": "d1", "permissions": rule("u1")}],
+        "projects": [{"id": "p1", "permissions": rule("u2"), "workbook_default_permissions": rule("u3")}],
+        "workbooks": [{"id": "w1", "permissions": rule("u4")}],
+    }
+    for stream_class in STREAM_TYPES:
+        if stream_class is not PermissionRulesStream:
+            monkeypatch.setattr(stream_class, "request_records", lambda self, context: iter(rows.get(self.name, [])))
+    server_client = SimpleNamespace(is_signed_in=lambda: True, _session=requests.Session(), auth_token="token")
+    monkeypatch.setattr(TapTableau, "get_server_client", lambda self: server_client)
+
+    tap = TapTableau(config={**TAP_CONFIG, "normalize_permissions": True}, parse_env_config=False)
+    assert [stream.name for stream in tap.get_sync_order()][-1] == "permission_rules"
+    tap.sync_all()
+
+    messages = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    records = [message for message in messages if message["type"] == "RECORD"]
+    streams = [record["stream"] for record in records]
+    assert streams.index("permission_rules") > max(streams.index(name) for name in rows)
+    referenced = {
+        value
+        for record in records
+        for key, value in record["record"].items()
+        if key.endswith("_rule_id")
+    }
+    emitted = {record["record"]["id"] for record in records if record["stream"] == "permission_rules"}
+    assert len(referenced) == 4
+    assert referenced <= emitted
+
+
+def test_child_rows_of_truncated_parents_are_discarded(monkeypatch):
+    """Rows collected for parent items cut off by max_records_per_stream don't outlive the parent's sync."""
+    from tap_tableau.streams import DatasourcesStream
+
+    config = {**TAP_CONFIG, "split_child_streams": True, "max_records_per_stream": 1}
+    tap = TapTableau(config=config, parse_env_config=False)
+    child = tap.streams["datasource_connections"]
+
+    def request_records(self, context):
+        for datasource_id in ("d1", "d2"):
+            child.pending[datasource_id] = [{"id": "c1"}]
+            yield {"id": datasource_id}
+
+    monkeypatch.setattr(DatasourcesStream, "request_records", request_records)
+    assert [row["id"] for row in tap.streams["datasources"].get_records(None)] == ["d1"]
+    assert child.pending == {}
+
+
+def test_deletions_are_detected_from_the_sync_listing(monkeypatch):
+    """Tombstones come from the ids listed while records synced, without listing the endpoint again."""
+    from types import SimpleNamespace
+
+    from tap_tableau.deletions import decode_id_set
+    from tap_tableau.deletions import encode_id_set
+    from tap_tableau.streams import DatasourcesStream
+
+    listings = []
+
+    def pager(self, endpoint, request_options=None):
+        listings.append(endpoint)
+        return iter([SimpleNamespace(id="d1"), SimpleNamespace(id="d3")])
+
+    monkeypatch.setattr(DatasourcesStream, "pager", pager)
+    monkeypatch.setattr(DatasourcesStream, "get_row", lambda self, datasource: {"id": datasource.id})
+    tap = TapTableau(config={**TAP_CONFIG, "detect_deletions": True}, parse_env_config=False)
+    stream = tap.streams["datasources"]
+    stream.server_client = SimpleNamespace(datasources="endpoint")
+    stream.stream_state["known_ids"] = encode_id_set({"d1", "d2"})
+
+    rows = list(stream.get_records(None))
+    assert [row["id"] for row in rows] == ["d1", "d3", "d2"]
+    assert "_sdc_deleted_at" in rows[-1]
+    assert len(listings) == 1
+    assert decode_id_set(stream.stream_state["known_ids"]) == {"d1", "d3"}
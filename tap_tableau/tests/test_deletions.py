@@ -0,0 +1,18 @@
+"""Tests for the id sets stored in state for deletion detection."""
+
+import uuid
+
+from tap_tableau.deletions import decode_id_set, encode_id_set
+
+
+def test_uuid_ids_round_trip():
+    ids = {str(uuid.uuid4()) for _ in range(100)}
+    encoded = encode_id_set(ids)
+    assert decode_id_set(encoded) == ids
+    assert len(encoded) < sum(len(id_) for id_ in ids)
+
+
+def test_other_ids_round_trip():
+    assert decode_id_set(encode_id_set(["b", "a"])) == {"a", "b"}
+    assert decode_id_set(encode_id_set([])) == set()
+    assert decode_id_set("") == set()
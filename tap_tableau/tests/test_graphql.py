@@ -0,0 +1,37 @@
+"""Tests for the metadata query builder."""
+
+from tap_tableau.graphql import SITE_LUID, compile_query, get_page, schema_selection
+
+SCHEMA = {
+    "properties": {
+        "id": {"type": ["string", "null"]},
+        "siteLuid": {"type": ["string", "null"]},
+        "upstreamTables": {
+            "type": ["array", "null"],
+            "items": {"type": "object", "properties": {"id": {"type": "string"}, "name": {"type": "string"}}},
+        },
+        "owner": {"type": "object", "properties": {"name": {"type": "string"}}},
+    }
+}
+
+
+def test_schema_selection_nests_objects_and_uses_derived_fields():
+    selection = schema_selection(SCHEMA, {"siteLuid": SITE_LUID})
+    assert selection == "id site { luid } upstreamTables { id name } owner { name }"
+
+
+def test_compile_query_is_cached_per_selection():
+    query = compile_query("tables", "tables", "id", "$ids: [ID]", "idWithin: $ids")
+    assert query == (
+        "query tables($first: Int, $after: String, $ids: [ID]) "
+        "{ tablesConnection(first: $first, after: $after, filter: {idWithin: $ids}) "
+        "{ nodes { id } pageInfo { hasNextPage endCursor } } }"
+    )
+    assert compile_query("tables", "tables", "id", "$ids: [ID]", "idWithin: $ids") is query
+
+
+def test_get_page_returns_the_next_cursor_until_the_last_page():
+    page = {"nodes": [{"id": "a"}], "pageInfo": {"hasNextPage": True, "endCursor": "c1"}}
+    assert get_page({"tablesConnection": page}, "tables") == ([{"id": "a"}], "c1")
+    page["pageInfo"]["hasNextPage"] = False
+    assert get_page({"tablesConnection": page}, "tables") == ([{"id": "a"}], None)
@@ -0,0 +1,51 @@
+"""Tests for the project hierarchy index."""
+
+from collections import namedtuple
+
+from tap_tableau.project_tree import ProjectTree
+
+Project = namedtuple("Project", ["id", "name", "parent_id"])
+
+
+def test_paths_and_ancestors():
+    projects = [
+        Project("c", "Reporting", "b"),
+        Project("a", "Default", None),
+        Project("b", "Finance", "a"),
+    ]
+    tree = ProjectTree(lambda: projects)
+    assert tree.get("c") == ("Default/Finance/Reporting", ["a", "b"])
+    assert tree.get("a") == ("Default", [])
+    assert tree.get("missing") == (None, [])
+
+
+def test_projects_are_loaded_once():
+    loads = []
+
+    def load_projects():
+        loads.append(1)
+        return [Project("a", "Default", None)]
+
+    tree = ProjectTree(load_projects)
+    tree.get("a")
+    tree.get("a")
+    assert len(loads) == 1
+
+
+def test_projects_without_a_parent_id():
+    tree = ProjectTree(lambda: [Project("a", "Default", None)])
+    assert tree.get(None) == (None, [])
+
+
+def test_load_builds_the_index_up_front():
+    loads = []
+
+    def load_projects():
+        loads.append(1)
+        return [Project("a", "Default", None)]
+
+    tree = ProjectTree(load_projects)
+    tree.load()
+    assert len(loads) == 1
+    assert tree.get("a") == ("Default", [])
+    assert len(loads) == 1
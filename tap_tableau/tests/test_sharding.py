@@ -0,0 +1,36 @@
+"""Tests for sharded metadata extraction."""
+
+from json import dumps
+
+import requests
+
+from tap_tableau.sharding import fetch_metadata_shard, split_into_shards
+
+
+def test_split_into_shards_is_contiguous_and_balanced():
+    ids = [str(i) for i in range(10)]
+    shards = split_into_shards(ids, 3)
+    assert [len(shard) for shard in shards] == [4, 3, 3]
+    assert sum(shards, []) == ids
+    assert split_into_shards(ids[:2], 4) == [["0"], ["1"]]
+
+
+def test_shard_rows_come_back_in_id_order(monkeypatch):
+    def post(self, url, json=None, headers=None):
+        # Two pages, each in reverse id order
+        ids = json["variables"]["ids"]
+        after = json["variables"].get("after")
+        page = ids[:2] if after is None else ids[2:]
+        connection = {
+            "nodes": [{"id": id_} for id_ in reversed(page)],
+            "pageInfo": {"hasNextPage": after is None, "endCursor": "c1"},
+        }
+        response = requests.Response()
+        response.status_code = 200
+        response._content = dumps({"data": {"calculatedFieldsConnection": connection}}).encode()
+        return response
+
+    monkeypatch.setattr(requests.Session, "post", post)
+    payload = {"query": "", "variables": {"first": 2, "ids": ["b", "c", "a"]}}
+    rows = fetch_metadata_shard("https://example.com/api/metadata/graphql", {}, payload, "calculatedFields", {})
+    assert [row["id"] for row in rows] == ["b", "c", "a"]
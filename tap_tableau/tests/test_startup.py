@@ -0,0 +1,17 @@
+"""Tests keeping tap start-up cheap for discovery and metadata-only runs."""
+
+import subprocess
+import sys
+
+
+def test_tap_import_defers_tableauserverclient():
+    """Importing the taps must not pull in TSC, which only the REST streams need."""
+    script = "import sys, tap_tableau.tap; print('tableauserverclient' in sys.modules)"
+    output = subprocess.check_output([sys.executable, "-c", script], text=True)
+    assert output.strip() == "False"
+
+
+def test_stream_schemas_are_built_once():
+    from tap_tableau.streams import UsersMetadataStream
+
+    assert UsersMetadataStream.schema is UsersMetadataStream.schema
@@ -0,0 +1,27 @@
+"""Tests for the record formatting and state helpers."""
+
+from datetime import datetime, timedelta, timezone
+
+from tap_tableau.utils import format_datetime
+from tap_tableau.utils import intern_string
+from tap_tableau.utils import is_older_than
+
+
+def test_full_sync_timestamps_expire_after_the_given_days():
+    assert is_older_than(None, 7)
+    assert is_older_than((datetime.now(timezone.utc) - timedelta(days=8)).isoformat(), 7)
+    assert not is_older_than(datetime.now(timezone.utc).isoformat(), 7)
+
+
+def test_intern_string_returns_one_object_per_value():
+    first = "".join(["Default ", "project"])
+    second = "".join(["Default ", "project"])
+    assert first is not second
+    assert intern_string(first) is intern_string(second)
+    assert intern_string(None) is None
+    assert intern_string(1) == 1
+
+
+def test_format_datetime():
+    assert format_datetime(datetime(2022, 6, 1, 12, 30, tzinfo=timezone.utc)) == "2022-06-01T12:30:00.000000Z"
+    assert format_datetime(None) is None
@@ -0,0 +1,66 @@
+"""Tests for the fast record writer."""
+
+import io
+import json
+from datetime import datetime, timezone
+
+from tap_tableau.writer import RecordWriter, dumps
+
+
+def test_dumps_matches_stdlib_json():
+    message = {"type": "RECORD", "stream": "s", "record": {"id": "a", "name": "é", "fields": [{"id": 1}], "flag": None}}
+    assert json.loads(dumps(message)) == message
+
+
+def test_dumps_formats_datetimes_as_iso():
+    value = datetime(2022, 5, 1, 12, 30, tzinfo=timezone.utc)
+    assert json.loads(dumps({"at": value})) == {"at": value.isoformat()}
+
+
+def test_records_are_written_in_blocks():
+    output = io.BytesIO()
+    writer = RecordWriter(block_size=100, output=output)
+    writer.write_record("s", {"id": 1})
+    assert output.getvalue() == b""
+    for index in range(2, 6):
+        writer.write_record("s", {"id": index}, "2022-05-01T00:00:00.000000Z")
+    assert output.getvalue()
+    writer.flush()
+    lines = output.getvalue().decode().splitlines()
+    assert [json.loads(line)["record"]["id"] for line in lines] == [1, 2, 3, 4, 5]
+    assert "time_extracted" not in json.loads(lines[0])
+
+
+def _write_users(monkeypatch, **config):
+    from tap_tableau import writer
+    from tap_tableau.tap import TapTableau
+
+    output = io.BytesIO()
+    monkeypatch.setattr(writer, "record_writer", RecordWriter(output=output))
+    tap_config = {
+        "server_url": "https://tableau.example.com",
+        "personal_access_token_name": "name",
+        "personal_access_token_secret": "secret",
+        "fast_record_writer": True,
+        **config,
+    }
+    stream = TapTableau(config=tap_config, parse_env_config=False).streams["users"]
+    for index in range(2):
+        stream._write_record_message({"id": str(index), "name": "user", "not_in_schema": True})
+    writer.record_writer.flush()
+    return stream, [json.loads(line) for line in output.getvalue().decode().splitlines()]
+
+
+def test_stream_records_are_conformed_by_default(monkeypatch):
+    _, messages = _write_users(monkeypatch)
+    assert [message["stream"] for message in messages] == ["users", "users"]
+    assert [message["record"] for message in messages] == [{"id": "0", "name": "user"}, {"id": "1", "name": "user"}]
+
+
+def test_trusted_stream_records_skip_conforming_until_a_sample_fails(monkeypatch):
+    _, messages = _write_users(monkeypatch, trusted_streams=["users"])
+    assert all(message["record"]["not_in_schema"] for message in messages)
+
+    stream, messages = _write_users(monkeypatch, trusted_streams=["users"], trusted_streams_validate_every=1)
+    assert "not_in_schema" not in messages[0]["record"]
+    assert not stream.is_trusted()
@@ -1,26 +1,100 @@
+import hashlib
+import itertools
+import json
+import sys
+from datetime import timedelta
+
 import singer
 
 
+def limit_records(records, max_records=None):
+    """Return the records, stopping after `max_records` if set."""
+    if not max_records:
+        return records
+    return itertools.islice(records, max_records)
+
+
+def intern_string(value):
+    """Intern strings that repeat across many records, pass anything else through."""
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
 def format_datetime(dt):
     if dt is not None:
         return singer.utils.strftime(dt)
     return None
 
 
+def format_filter_datetime(value):
+    """Return a bookmark timestamp in the format REST API filter expressions expect."""
+    return singer.utils.strptime_to_utc(value).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def is_older_than(value, days):
+    """Return whether a timestamp kept in state is missing or at least `days` days old."""
+    if not value:
+        return True
+    return singer.utils.now() - singer.utils.strptime_to_utc(value) >= timedelta(days=days)
+
+
+def get_tags(tags):
+    if not tags:
+        return []
+    return [intern_string(tag) for tag in tags]
+
+
+def get_capabilities(capabilities):
+    return {intern_string(name): intern_string(mode) for name, mode in capabilities.items()}
+
+
 def get_permission_details(permission):
+    grantee = permission.grantee
     return {
-        'capabilities': permission.capabilities,
-        'grantee_id': permission.grantee.id,
-        'grantee_tag_name': permission.grantee.tag_name
+        'capabilities': get_capabilities(permission.capabilities),
+        'grantee_id': intern_string(grantee.id),
+        'grantee_tag_name': intern_string(grantee.tag_name)
     }
 
 
+def get_permission_rule_id(permissions):
+    """Return a content hash identifying a permission rule set regardless of its order."""
+    permissions.sort(key=lambda permission: (permission['grantee_tag_name'] or '', permission['grantee_id'] or ''))
+    canonical = json.dumps(permissions, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def get_connection_details(connection):
+    return {
+        'connection_type': intern_string(connection.connection_type),
+        'datasource_id': connection.datasource_id,
+        'datasource_name': intern_string(connection.datasource_name),
+        'embed_password': connection.embed_password,
+        'id': connection.id,
+        'server_address': intern_string(connection.server_address),
+        'server_port': connection.server_port,
+        'username': intern_string(connection.username)
+    }
+
+
+def get_workbook_permissions(server_client, workbook):
+    """Return a workbook's permission rows, empty if the server refuses to list them."""
+    from tableauserverclient.server.endpoint.exceptions import ServerResponseError
+
+    server_client.workbooks.populate_permissions(workbook)
+    try:
+        return [get_permission_details(permission) for permission in workbook.permissions]
+    except ServerResponseError:
+        return []
+
+
 def get_user_details(user):
     return {
         'id': user.id,
-        'auth_setting': user.auth_setting,
+        'auth_setting': intern_string(user.auth_setting),
         'email': user.email,
         'name': user.name,
         'full_name': user.fullname,
-        'role': user.site_role,
+        'role': intern_string(user.site_role),
     }
@@ -0,0 +1,117 @@
+"""Fast path for RECORD messages, encoding with orjson when installed and writing stdout in blocks."""
+
+import json
+import sys
+from datetime import date, datetime, timezone
+from types import ModuleType
+from typing import TYPE_CHECKING, BinaryIO, Optional
+
+orjson: Optional[ModuleType]
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if TYPE_CHECKING:
+    from singer_sdk.streams.core import Stream
+else:
+    # The mixin only comes before a Stream in a stream class's bases
+    Stream = object
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(message: dict) -> bytes:
+    """Encode a message as compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(message, default=_default)
+    return json.dumps(message, separators=(",", ":"), default=_default).encode()
+
+
+class RecordWriter:
+    """Encode RECORD messages into a block buffer and write it to stdout once `block_size` bytes are pending.
+
+    Anything else written to stdout must `flush` first so messages stay in order.
+    """
+
+    def __init__(self, block_size: int = 1 << 16, output: Optional[BinaryIO] = None):
+        self.block_size = block_size
+        self.output = output
+        self._buffer = bytearray()
+
+    def write_record(self, stream_name: str, record: dict, time_extracted: Optional[str] = None) -> None:
+        message = {"type": "RECORD", "stream": stream_name, "record": record}
+        if time_extracted:
+            message["time_extracted"] = time_extracted
+        self._buffer += dumps(message)
+        self._buffer += b"\n"
+        if len(self._buffer) >= self.block_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        output = self.output
+        if output is None:
+            sys.stdout.flush()
+            output = sys.stdout.buffer
+        output.write(self._buffer)
+        output.flush()
+        self._buffer.clear()
+
+
+# One writer per process, as every stream shares stdout
+record_writer = RecordWriter()
+
+
+class FastRecordWriterMixin(Stream):
+    """Stream mixin writing records through `record_writer` when `fast_record_writer` is set.
+
+    Records of streams listed in `trusted_streams` skip type conforming, except every
+    `trusted_streams_validate_every`-th record; a sampled record that needed conforming ends the trust for the run.
+    """
+
+    _records_written = 0
+    _trusted: Optional[bool] = None
+
+    def is_trusted(self) -> bool:
+        if self._trusted is None:
+            self._trusted = self.name in (self.config.get("trusted_streams") or [])
+        return self._trusted
+
+    def _write_record_message(self, record: dict) -> None:
+        if not self.config.get("fast_record_writer"):
+            super()._write_record_message(record)
+            return
+        from singer_sdk.helpers._catalog import pop_deselected_record_properties
+        from singer_sdk.helpers._typing import conform_record_data_types
+
+        # Removes deselected properties in place
+        pop_deselected_record_properties(record, self.schema, self.mask, self.logger)
+        self._records_written += 1
+        validate_every = self.config.get("trusted_streams_validate_every")
+        if not self.is_trusted():
+            record = conform_record_data_types(stream_name=self.name, row=record, schema=self.schema, logger=self.logger)
+        elif validate_every and self._records_written % validate_every == 0:
+            conformed = conform_record_data_types(stream_name=self.name, row=record, schema=self.schema, logger=self.logger)
+            if conformed != record:
+                self.logger.warning(f"Sampled record of trusted stream '{self.name}' needed conforming, conforming all records")
+                self._trusted = False
+            record = conformed
+        time_extracted = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        for stream_map in self.stream_maps:
+            mapped_record = stream_map.transform(record)
+            if mapped_record is not None:
+                record_writer.write_record(stream_map.stream_alias, mapped_record, time_extracted)
+
+    def _write_schema_message(self) -> None:
+        record_writer.flush()
+        super()._write_schema_message()
+
+    def _write_state_message(self) -> None:
+        record_writer.flush()
+        super()._write_state_message()